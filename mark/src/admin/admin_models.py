@@ -1,13 +1,37 @@
-from sqladmin import ModelView
+from typing import Any
+
+from sqlalchemy import or_
+from sqlalchemy.sql.selectable import Select
 from wtforms import Form, StringField
 from wtforms.validators import Optional
 
+from admin.pagination import KeysetModelView
 from models.entity import Product, ProductHS
+from services.products import products_version
+from services.products_hs import hs_version
 
 PRODUCT_NAME = "name"
+LIKE_ESCAPE = "\\"  # The default escape character of LIKE in Postgres
+
+
+def search_columns(
+    stmt: Select[Any], columns: list[Any], term: str
+) -> Select[Any]:
+    """
+    ILIKE on the columns themselves, without the sqladmin CAST,
+    so the search can use the trigram indexes (gin_trgm_ops).
+    """
+    escaped = (
+        term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", f"{LIKE_ESCAPE}%")
+        .replace("_", f"{LIKE_ESCAPE}_")
+    )
+    return stmt.filter(
+        or_(*(column.ilike(f"%{escaped}%") for column in columns))
+    )
 
 
-class ProductAdmin(ModelView, model=Product):  # type: ignore
+class ProductAdmin(KeysetModelView, model=Product):  # type: ignore
     page_title = "Управление QR"
     column_list = [
         Product.name,
@@ -57,6 +81,10 @@ class ProductAdmin(ModelView, model=Product):  # type: ignore
     can_edit = True
     can_delete = True
     page_size = 50
+    data_version = products_version
+
+    def search_query(self, stmt: Select[Any], term: str) -> Select[Any]:
+        return search_columns(stmt, self.column_searchable_list, term)
 
     async def scaffold_form(
         self, rules: list[str] | None = None
@@ -83,7 +111,7 @@ class ProductAdmin(ModelView, model=Product):  # type: ignore
         return form_class  # type: ignore
 
 
-class ProductHSAdmin(ModelView, model=ProductHS):  # type: ignore
+class ProductHSAdmin(KeysetModelView, model=ProductHS):  # type: ignore
     page_title = "Управление QR"
     column_list = [
         ProductHS.name,
@@ -113,10 +141,14 @@ class ProductHSAdmin(ModelView, model=ProductHS):  # type: ignore
         ProductHS.data_in,
     ]
     column_searchable_list = [
-        Product.name,
-        Product.code_mark_head,
+        ProductHS.name,
+        ProductHS.code_mark_head,
     ]
     can_create = True
     can_edit = True
     can_delete = True
     page_size = 50
+    data_version = hs_version
+
+    def search_query(self, stmt: Select[Any], term: str) -> Select[Any]:
+        return search_columns(stmt, self.column_searchable_list, term)
@@ -0,0 +1,139 @@
+from typing import Any, Hashable
+
+from fastapi import Request
+from sqladmin import ModelView
+from sqladmin.pagination import Pagination
+from sqlalchemy import asc, desc, func, select, text, tuple_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.selectable import Select
+
+from core.cache import DataVersion, TTLCache
+from core.settings import settings
+
+ESTIMATED_COUNT_QUERY = text(
+    "SELECT reltuples::bigint FROM pg_class "
+    "WHERE oid = CAST(:table_name AS regclass)"
+)
+
+# Last (sort value, pk) of the seen pages by list view, data version,
+# sort and search.
+page_boundaries: TTLCache[Hashable, dict[int, tuple[Any, Any]]] = TTLCache(
+    settings.ADMIN_KEYSET_CACHE_SIZE, settings.ADMIN_KEYSET_CACHE_TTL
+)
+
+
+class KeysetModelView(ModelView):  # type: ignore
+    """
+    List view for large tables:
+    - estimated count from pg_class.reltuples above the threshold;
+    - keyset pagination by (sort column, pk) from the nearest seen page,
+      OFFSET only for the pages after it.
+    Nullable sort columns use the default OFFSET pagination.
+    Seen pages are forgotten when data_version changes: boundaries of
+    the old data may skip or repeat rows.
+    """
+
+    exact_count_max_rows = settings.ADMIN_EXACT_COUNT_MAX_ROWS
+    data_version: DataVersion | None = None
+
+    async def count(
+        self, request: Request, stmt: Select[Any] | None = None
+    ) -> int:
+        if stmt is not None:
+            return await super().count(request, stmt)  # type: ignore
+        rows = await self._run_query(
+            ESTIMATED_COUNT_QUERY.bindparams(
+                table_name=self.model.__table__.name
+            )
+        )
+        # -1 for the table which has never been analyzed.
+        if rows and rows[0] > self.exact_count_max_rows:
+            return int(rows[0])
+        return await super().count(request)  # type: ignore
+
+    async def list(self, request: Request) -> Pagination:
+        sort_name, is_desc = self._get_sort(request)
+        column = self.model.__table__.c.get(sort_name)
+        if column is None or column.nullable:
+            return await super().list(request)
+
+        page = self.validate_page_number(request.query_params.get("page"), 1)
+        page_size = self.validate_page_number(
+            request.query_params.get("pageSize"), 0
+        )
+        page_size = min(
+            page_size or self.page_size, max(self.page_size_options)
+        )
+        search = request.query_params.get("search", None)
+
+        stmt = self.list_query(request)
+        for relation in self._list_relations:
+            stmt = stmt.options(selectinload(relation))
+        if search:
+            stmt = self.search_query(stmt=stmt, term=search)
+            count = await self.count(
+                request, select(func.count()).select_from(stmt)
+            )
+        else:
+            count = await self.count(request)
+
+        sort_column = getattr(self.model, sort_name)
+        pk_column = getattr(self.model, self.pk_columns[0].name)
+        order = desc if is_desc else asc
+        stmt = stmt.order_by(order(sort_column), order(pk_column))
+
+        version = self.data_version.value if self.data_version else None
+        key = (self.identity, version, sort_name, is_desc, page_size, search)
+        _, cached = page_boundaries.get(key)
+        boundaries = cached or {}
+        seen = max(
+            (number for number in boundaries if number < page), default=0
+        )
+        if seen:
+            boundary = tuple_(sort_column, pk_column)
+            after = boundaries[seen]
+            stmt = stmt.where(
+                boundary < after if is_desc else boundary > after
+            )
+        stmt = stmt.limit(page_size)
+        if page - seen > 1:  # No seen page right before the requested one
+            stmt = stmt.offset((page - seen - 1) * page_size)
+        rows = await self._run_query(stmt)
+
+        if rows:
+            last = rows[-1]
+            boundaries[page] = (
+                getattr(last, sort_name),
+                getattr(last, pk_column.key),
+            )
+            page_boundaries.set(key, boundaries)
+        return Pagination(
+            rows=rows, page=page, page_size=page_size, count=count
+        )
+
+    async def after_model_change(
+        self,
+        data: dict[str, Any],
+        model: Any,
+        is_created: bool,
+        request: Request,
+    ) -> None:
+        self._data_changed()
+
+    async def after_model_delete(self, model: Any, request: Request) -> None:
+        self._data_changed()
+
+    def _data_changed(self) -> None:
+        if self.data_version is not None:
+            self.data_version.bump()
+
+    def _get_sort(self, request: Request) -> tuple[str, bool]:
+        """
+        Sort of the request, the default one for columns which are not
+        sortable in the view.
+        """
+        sort_by = request.query_params.get("sortBy", None)
+        if sort_by in self._sort_fields:
+            return sort_by, request.query_params.get("sort", "asc") == "desc"
+        sort_field, is_desc = self._get_default_sort()[0]
+        return self._get_prop_name(sort_field), is_desc
@@ -1,7 +1,8 @@
 from datetime import date
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
+from core.settings import settings
 from models.entity import EMPTY, StatusEnum
 
 
@@ -34,3 +35,39 @@ class ProductPutch(BaseModel):  # type: ignore
     status: StatusEnum | None = None
 
     model_config = ConfigDict(extra="forbid")
+
+
+class ProductLookup(BaseModel):  # type: ignore
+    codes: list[str] = Field(
+        min_length=1, max_length=settings.QR_LOOKUP_MAX_CODES
+    )
+
+
+class ProductLookupResult(BaseModel):  # type: ignore
+    found: list[Product]
+    not_found: list[str]
+
+
+class ProductBatch(BaseModel):  # type: ignore
+    products: list[Product] = Field(
+        min_length=1, max_length=settings.QR_BATCH_MAX_PRODUCTS
+    )
+
+
+class ProductBatchResult(BaseModel):  # type: ignore
+    created: list[str]
+    existing: list[str]
+
+
+class ProductWriteOff(BaseModel):  # type: ignore
+    doc_out: str
+    data_out: date | None = None
+    codes: list[str] = Field(
+        min_length=1, max_length=settings.QR_BATCH_MAX_PRODUCTS
+    )
+
+
+class ProductWriteOffResult(BaseModel):  # type: ignore
+    deducted: int
+    not_found: list[str]
+    already_deducted: list[str]
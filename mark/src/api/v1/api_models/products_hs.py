@@ -1,6 +1,9 @@
 from datetime import datetime
+from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from models.entity import StatusEnum
 
 
 class ProductHSModel(BaseModel):  # type: ignore
@@ -19,3 +22,82 @@ class ProductCheck(BaseModel):  # type: ignore
     name: str | None = None
     code_mark_head_hs: str | None = None
     name_hs: str | None = None
+
+
+class ProductCheckPage(BaseModel):  # type: ignore
+    items: list[ProductCheck]
+    next_cursor: str | None = None
+    total: int | None = None
+
+
+class ProductCheckAll(BaseModel):  # type: ignore
+    counts: dict[str, int]
+    items: dict[str, list[ProductCheck]]
+
+
+class CheckApply(BaseModel):  # type: ignore
+    key: str
+    status: StatusEnum | None = None
+    dry_run: bool = False
+
+
+class CheckApplyResult(BaseModel):  # type: ignore
+    key: str
+    status: StatusEnum
+    affected: int
+    dry_run: bool
+
+
+class HSRowError(BaseModel):  # type: ignore
+    column: str
+    reason: str
+    count: int
+    rows: list[int] = []
+
+
+class HSAcceptResult(BaseModel):  # type: ignore
+    processed: int
+    accepted: int
+    rejected: int
+    errors: list[HSRowError] = []
+    report_id: str | None = None
+    files: dict[str, int] = {}
+    duplicate: bool = False
+
+
+class HSSyncResult(BaseModel):  # type: ignore
+    processed: int
+    inserted: int
+    updated: int
+    removed: int
+    files: dict[str, int] = {}
+    duplicate: bool = False
+
+
+class HSLoadResult(BaseModel):  # type: ignore
+    processed: int
+    files: dict[str, int] = {}
+    duplicate: bool = False
+    synced: HSSyncResult | None = None
+
+
+class CheckSummaryModel(BaseModel):  # type: ignore
+    source: str
+    counts: dict[str, int]
+    statuses: dict[str, int]
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class HSJob(BaseModel):  # type: ignore
+    id: str
+    mode: str
+    stage: str
+    rows_processed: int = 0
+    rows_per_second: float = 0.0
+    files: dict[str, int] = {}
+    errors: list[Any] = []
+    result: dict[str, Any] | None = None
+    started_at: datetime
+    finished_at: datetime | None = None
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
 from core.logger import logger
+from services.products import product_cache
+from services.products_hs import check_cache
 
 health_router = APIRouter()
 
@@ -13,3 +15,21 @@ health_router = APIRouter()
 async def check_health() -> dict[str, str]:
     logger.info("availability confirmed")
     return {"status": "OK"}
+
+
+@health_router.get(
+    "/cache",
+    summary="cache statistics",
+    description="Hits and misses of the product by QR cache.",
+)  # type: ignore
+async def cache_stats() -> dict[str, int]:
+    return product_cache.stats()
+
+
+@health_router.get(
+    "/cache/check",
+    summary="check cache statistics",
+    description="Hits and misses of the reconciliation results cache.",
+)  # type: ignore
+async def check_cache_stats() -> dict[str, int]:
+    return check_cache.stats()
@@ -1,10 +1,21 @@
+from datetime import date
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.responses import ORJSONResponse
 
 from api.v1.api_models.products import Product as ProductScheme
-from api.v1.api_models.products import ProductPutch
+from api.v1.api_models.products import (
+    ProductBatch,
+    ProductBatchResult,
+    ProductLookup,
+    ProductLookupResult,
+    ProductPutch,
+    ProductWriteOff,
+    ProductWriteOffResult,
+)
 from core.logger import logger
+from core.settings import settings
 from services.products import ProductService, get_product_service
 
 product_router = APIRouter()
@@ -49,6 +60,98 @@ async def create_product(
     return ProductScheme.model_validate(product_new)  # type: ignore
 
 
+@product_router.post(
+    "/batch",
+    summary="add products",
+    description=(
+        "Add products of a document in one transaction. "
+        "Products with existing QR are skipped."
+    ),
+)  # type: ignore
+async def create_products(
+    batch: ProductBatch,
+    product_service: ProductService = Depends(get_product_service),
+) -> ProductBatchResult:
+    created, existing = await product_service.create_products(batch.products)
+    logger.info(
+        f"Products created: {len(created)}, already exist: {len(existing)}."
+    )
+    return ProductBatchResult(created=created, existing=existing)
+
+
+@product_router.post(
+    "/lookup",
+    summary="products information",
+    description="Information about products by the list of QR.",
+    response_class=ORJSONResponse,
+)  # type: ignore
+async def lookup_products(
+    lookup: ProductLookup,
+    product_service: ProductService = Depends(get_product_service),
+) -> ProductLookupResult:
+    products, not_found = await product_service.get_products_by_qr(
+        lookup.codes
+    )
+    logger.info(
+        f"Lookup of {len(lookup.codes)} QR: {len(not_found)} not found."
+    )
+    return ProductLookupResult(
+        found=[ProductScheme.model_validate(product) for product in products],
+        not_found=not_found,
+    )
+
+
+@product_router.post(
+    "/write-off",
+    summary="deduct products",
+    description="Deduct products by the outgoing document.",
+)  # type: ignore
+async def write_off_products(
+    write_off: ProductWriteOff,
+    product_service: ProductService = Depends(get_product_service),
+) -> ProductWriteOffResult:
+    result = await product_service.write_off(
+        write_off.codes, write_off.doc_out, write_off.data_out
+    )
+    logger.info(f"Document {write_off.doc_out} deducted: {result.deducted}.")
+    return result
+
+
+@product_router.post(
+    "/write-off/csv",
+    summary="deduct products from file",
+    description=(
+        "Deduct products by the outgoing document. "
+        "The file contains one QR per line."
+    ),
+)  # type: ignore
+async def write_off_products_csv(
+    doc_out: str = Form(...),
+    data_out: date | None = Form(None),
+    file_codes: UploadFile = File(...),
+    product_service: ProductService = Depends(get_product_service),
+) -> ProductWriteOffResult:
+    try:
+        content = (await file_codes.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail="file must be in UTF-8",
+        )
+    codes = [line.strip() for line in content.splitlines() if line.strip()]
+    if not codes or len(codes) > settings.QR_BATCH_MAX_PRODUCTS:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=(
+                "file must contain from 1 to "
+                f"{settings.QR_BATCH_MAX_PRODUCTS} QR"
+            ),
+        )
+    result = await product_service.write_off(codes, doc_out, data_out)
+    logger.info(f"Document {doc_out} deducted: {result.deducted}.")
+    return result
+
+
 @product_router.patch(
     "/{product_qr:path}",
     summary="update product",
@@ -1,8 +1,31 @@
-from fastapi import APIRouter, Depends, File, UploadFile
+from http import HTTPStatus
+from typing import Any
 
-from api.v1.api_models.products_hs import ProductCheck
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+
+from api.v1.api_models.products_hs import (
+    CheckApply,
+    CheckApplyResult,
+    CheckSummaryModel,
+    HSJob,
+    HSSyncResult,
+    ProductCheck,
+    ProductCheckAll,
+    ProductCheckPage,
+)
 from core.logger import logger
+from core.settings import settings
+from services.jobs import (
+    JOB_ACCEPT,
+    JOB_LOAD,
+    JOB_RELOAD,
+    JOB_SYNC,
+    job_registry,
+)
 from services.products_hs import ProductHSService, get_product_hs_service
+from services.rejects import get_report_path
+from services.summary import SummaryService, get_summary_service
 
 producths_router = APIRouter()
 
@@ -10,17 +33,129 @@ producths_router = APIRouter()
 @producths_router.post(
     "/upload-zip/",
     summary="load zip file",
-    description="Load informations from HS.",
+    description=(
+        "Load informations from HS. All CSV files of the archive are "
+        "loaded as one upload, rows by file are returned in files. "
+        "With stream=true the file is processed by chunks from disk. "
+        "With partial=true valid rows are committed by chunks, invalid "
+        "and duplicate rows are returned by reason and stored in the "
+        "report, see /rejects/{report_id}/. "
+        "With background=true the job id is returned at once, "
+        "see /jobs/{job_id}/. "
+        "With diff=true an upload close to the latest one (the same CSV "
+        "files, most of them unchanged) is applied as a sync, result "
+        "counts are in synced."
+    ),
 )  # type: ignore
 async def upload_zip(
     file_hs: UploadFile = File(...),
+    stream: bool = False,
+    partial: bool = False,
+    background: bool = False,
+    diff: bool = False,
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> dict[str, Any]:
+    if background:
+        mode = JOB_ACCEPT if partial else JOB_LOAD
+        job = await product_hs_service.start_job(file_hs, mode, diff)
+        logger.info(f"{mode} job {job.id}")
+        return {"status": "accepted", "job_id": job.id}
+    if partial:
+        accept = await product_hs_service.accept_zip(file_hs)
+        logger.info(f"accept {accept}")
+        return {"status": "success", **accept.model_dump()}
+    if stream:
+        result = await product_hs_service.load_zip_stream(file_hs, diff)
+        logger.info(f"load {result}")
+        return {"status": "success", **result.model_dump()}
+    result = await product_hs_service.load_zip(file_hs, diff)
+    logger.info(f"load {result}")
+    return {"status": "success", **result.model_dump()}
+
+
+@producths_router.post(
+    "/sync-zip/",
+    summary="sync with zip file",
+    description=(
+        "Sync the table with the HS snapshot: insert new codes, "
+        "update changed ones and delete codes missing in the snapshot. "
+        "An empty snapshot is refused. A sync removing more than "
+        "HS_SYNC_MAX_REMOVED_SHARE of the codes is refused with 409 "
+        "unless force=true. "
+        "With background=true the job id is returned at once."
+    ),
+)  # type: ignore
+async def sync_zip(
+    file_hs: UploadFile = File(...),
+    background: bool = False,
+    force: bool = False,
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> HSSyncResult | dict[str, str]:
+    if background:
+        job = await product_hs_service.start_job(
+            file_hs, JOB_SYNC, force=force
+        )
+        logger.info(f"sync job {job.id}")
+        return {"status": "accepted", "job_id": job.id}
+    result = await product_hs_service.sync_zip(file_hs, force)
+    logger.info(f"sync {result}")
+    return result
+
+
+@producths_router.post(
+    "/reload-zip/",
+    summary="replace data with zip file",
+    description=(
+        "Replace the table with the HS snapshot. The data is loaded into "
+        "a staging table and swapped in atomically. "
+        "With background=true the job id is returned at once."
+    ),
+)  # type: ignore
+async def reload_zip(
+    file_hs: UploadFile = File(...),
+    background: bool = False,
     product_hs_service: ProductHSService = Depends(get_product_hs_service),
-) -> dict[str, str | int]:
-    csv_content = await product_hs_service.get_csv_from_zip(file_hs)
-    df = await product_hs_service.process_csv(csv_content)
-    await product_hs_service.load_data(df)
-    logger.info(f"load {len(df)}")
-    return {"status": "success", "processed": len(df)}
+) -> dict[str, Any]:
+    if background:
+        job = await product_hs_service.start_job(file_hs, JOB_RELOAD)
+        logger.info(f"reload job {job.id}")
+        return {"status": "accepted", "job_id": job.id}
+    result = await product_hs_service.reload_zip(file_hs)
+    logger.info(f"reload {result}")
+    return {"status": "success", **result.model_dump()}
+
+
+@producths_router.get(
+    "/jobs/{job_id}/",
+    summary="background job status",
+    description=(
+        "Stage, processed rows, rows per second and errors "
+        "of the background upload."
+    ),
+)  # type: ignore
+async def job_status(job_id: str) -> HSJob:
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, "Job not found")
+    return job
+
+
+@producths_router.get(
+    "/rejects/{report_id}/",
+    summary="rejected rows report",
+    description=(
+        "CSV with rows rejected by the partial load: row number in the "
+        "upload, column and reason, HS columns."
+    ),
+    response_class=FileResponse,
+)  # type: ignore
+async def rejects_report(report_id: str) -> FileResponse:
+    path = get_report_path(report_id)
+    if path is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, "Report not found")
+    return FileResponse(
+        path, media_type="text/csv", filename=f"rejects_{report_id}.csv"
+    )
 
 
 @producths_router.delete(
@@ -47,24 +182,124 @@ async def check(
 ) -> list[ProductCheck]:
     difference = await product_hs_service.check(key)
     if difference:
-        diff: list[dict[str, str]] = [
-            {
-                **(
-                    {"name": pr.name, "code_mark_head": pr.code_mark_head}
-                    if pr
-                    else {}
-                ),
-                **(
-                    {
-                        "name_hs": pr2.name,
-                        "code_mark_head_hs": pr2.code_mark_head,
-                    }
-                    if pr2
-                    else {}
-                ),
-            }
-            for pr, pr2 in difference
-        ]
         logger.info("check table")
-        return [ProductCheck(**prod_check) for prod_check in diff]
-    return []
+    return difference
+
+
+@producths_router.get(
+    "/check/all/",
+    summary="check data by all keys",
+    description=(
+        "Data reconciliation between the HS and the database by all keys "
+        "(hs_base, base_hs, hs_hs) in one scan. Returns counts and rows "
+        "for every key."
+    ),
+)  # type: ignore
+async def check_all(
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> ProductCheckAll:
+    result = await product_hs_service.check_all()
+    logger.info(f"check table all: {result.counts}")
+    return result
+
+
+@producths_router.post(
+    "/check/apply/",
+    summary="apply check data",
+    description=(
+        "Set the status of all products found by the check with one "
+        "UPDATE. Default status: hs_hs -> IN_HS_DEDUCTED. "
+        "With dry_run only the number of affected products is returned."
+    ),
+)  # type: ignore
+async def apply_check(
+    apply: CheckApply,
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> CheckApplyResult:
+    result = await product_hs_service.apply_check(
+        apply.key, apply.status, apply.dry_run
+    )
+    logger.info(f"apply check: {result}")
+    return result
+
+
+@producths_router.get(
+    "/check/page/",
+    summary="check data by pages",
+    description=(
+        "Data reconciliation between the HS and the database by pages. "
+        "Pass next_cursor of the page as after to get the next one."
+    ),
+)  # type: ignore
+async def check_page(
+    key: str,
+    limit: int = Query(
+        settings.CHECK_PAGE_SIZE, ge=1, le=settings.CHECK_PAGE_MAX_SIZE
+    ),
+    after: str | None = None,
+    with_total: bool = False,
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> ProductCheckPage:
+    page = await product_hs_service.check_page(key, limit, after, with_total)
+    logger.info(f"check table page: {len(page.items)}")
+    return page
+
+
+@producths_router.get(
+    "/check/export/",
+    summary="export check data",
+    description=(
+        "Data reconciliation between the HS and the database as CSV. "
+        "Rows are streamed from a server-side cursor."
+    ),
+    response_class=StreamingResponse,
+)  # type: ignore
+async def export_check(
+    key: str,
+    product_hs_service: ProductHSService = Depends(get_product_hs_service),
+) -> StreamingResponse:
+    content = product_hs_service.export_check_csv(key)
+    logger.info(f"export check table: {key}")
+    return StreamingResponse(
+        content,
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="check_{key}.csv"'
+        },
+    )
+
+
+@producths_router.get(
+    "/summary/",
+    summary="check summary",
+    description=(
+        "Counts of the reconciliation by check key and of products "
+        "by status, precomputed after every load."
+    ),
+)  # type: ignore
+async def summary(
+    summary_service: SummaryService = Depends(get_summary_service),
+) -> CheckSummaryModel:
+    latest = await summary_service.get_latest()
+    if latest is None:
+        raise HTTPException(
+            HTTPStatus.SERVICE_UNAVAILABLE, "Сводка недоступна"
+        )
+    return CheckSummaryModel.model_validate(latest)  # type: ignore
+
+
+@producths_router.get(
+    "/summary/history/",
+    summary="check summary history",
+    description="Summaries of the latest loads, newest first.",
+)  # type: ignore
+async def summary_history(
+    limit: int = Query(
+        settings.CHECK_SUMMARY_HISTORY_SIZE,
+        ge=1,
+        le=settings.CHECK_PAGE_MAX_SIZE,
+    ),
+    summary_service: SummaryService = Depends(get_summary_service),
+) -> list[CheckSummaryModel]:
+    history = await summary_service.get_history(limit)
+    return [CheckSummaryModel.model_validate(summary) for summary in history]
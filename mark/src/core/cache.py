@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded in-process cache with LRU eviction and time to live.
+    Every worker process has its own cache.
+    maxsize bounds the total weight of the values, by default every
+    value weighs 1; a value weighs at least 1.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+        weigh: Callable[[V], int] | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V, int]] = OrderedDict()
+
+    def get(self, key: K) -> tuple[bool, V | None]:
+        """
+        Returns (True, value) on hit and (False, None) on miss,
+        so None can be cached as a value.
+        """
+        item = self._data.get(key)
+        if item is None or item[0] < self.timer():
+            self._pop(key)
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, item[1]
+
+    def set(self, key: K, value: V) -> None:
+        """
+        A value heavier than maxsize is not cached.
+        """
+        weight = max(self.weigh(value), 1) if self.weigh else 1
+        self._pop(key)
+        if weight > self.maxsize:
+            return
+        self._data[key] = (self.timer() + self.ttl, value, weight)
+        self.weight += weight
+        while self.weight > self.maxsize:
+            self._pop(next(iter(self._data)))
+
+    def invalidate(self, *keys: K) -> None:
+        for key in keys:
+            self._pop(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _pop(self, key: K) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.weight -= item[2]
+
+
+class DataVersion:
+    """
+    Counter of writes to a data set in this process.
+    A new value makes cached results of older versions unreachable.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def bump(self) -> int:
+        self.value += 1
+        return self.value
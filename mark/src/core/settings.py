@@ -15,16 +15,51 @@ class Settings(BaseSettings):  # type: ignore
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "mark"
-    POSTGRES_DB_ECHO: bool = True
+    POSTGRES_DB_ECHO: bool = False
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30.0
+    POSTGRES_POOL_PRE_PING: bool = True
+    POSTGRES_POOL_RECYCLE: int = 1800
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
 
     SECRET_KEY: str = "your-secret-key"
     ALGORITHM: str = "HS256"
     USER_ADMIN: str = "admin"
     PASS_ADMIN: str = "pass"
+    ADMIN_EXACT_COUNT_MAX_ROWS: int = 100_000
+    ADMIN_KEYSET_CACHE_SIZE: int = 1_000
+    ADMIN_KEYSET_CACHE_TTL: float = 600.0
 
     BASE_DIR: str = str(Path(__file__).resolve().parent.parent)
     LOGGING_FILE_MAX_BYTES: int = 500_000
 
+    QR_LOOKUP_MAX_CODES: int = 5_000
+    QR_BATCH_MAX_PRODUCTS: int = 10_000
+    QR_CACHE_SIZE: int = 10_000
+    QR_CACHE_TTL: float = 30.0
+
+    CHECK_PAGE_SIZE: int = 1_000
+    CHECK_PAGE_MAX_SIZE: int = 10_000
+    CHECK_EXPORT_BATCH_ROWS: int = 5_000
+    CHECK_SUMMARY_HISTORY_SIZE: int = 100
+    CHECK_SUMMARY_REFRESH_DELAY: float = 2.0
+    CHECK_CACHE_TTL: float = 300.0
+    CHECK_CACHE_MAX_ROWS: int = 100_000
+
+    HS_UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    HS_COPY_BATCH_ROWS: int = 10_000
+    HS_LOAD_CONNECTIONS: int = 1
+    HS_MAX_STRING_LENGTH: int = 1024
+    HS_MAX_REPORTED_ROWS: int = 100
+    HS_PARSE_WORKERS: int = 2
+    HS_CSV_ENGINE: str = "pyarrow"
+    HS_PARSE_BLOCK_BYTES: int = 8 * 1024 * 1024
+    HS_JOBS_KEEP: int = 100
+    HS_REJECTS_KEEP: int = 100
+    HS_SNAPSHOT_NEAR_SHARE: float = 0.5
+    HS_SYNC_MAX_REMOVED_SHARE: float = 0.5
+
     @property
     def dsn(self) -> str:
         return (
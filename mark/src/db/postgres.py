@@ -20,7 +20,17 @@ from sqlalchemy.orm import (
 from core.settings import settings
 
 engine = create_async_engine(
-    settings.dsn, echo=settings.POSTGRES_DB_ECHO, future=True
+    settings.dsn,
+    echo=settings.POSTGRES_DB_ECHO,
+    pool_size=settings.POSTGRES_POOL_SIZE,
+    max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+    pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+    connect_args={
+        "statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE
+    },
+    future=True,
 )
 async_session = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
@@ -14,13 +14,17 @@ from api.v1.products_hs import producths_router
 from core.logger import LOGGING, logger
 from core.settings import settings
 from db.postgres import engine
+from services.jobs import job_registry
+from services.parsing import shutdown_process_pool
+from services.summary import summary_refresher
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    ...
     yield
-    ...
+    await job_registry.shutdown()
+    await summary_refresher.shutdown()
+    shutdown_process_pool()
 
 
 app = FastAPI(
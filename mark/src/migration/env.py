@@ -8,7 +8,12 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from core.settings import settings
 from db.postgres import Base
-from models.entity import Product, ProductHS  # noqa: F401
+from models.entity import (  # noqa: F401
+    CheckSummary,
+    HSSnapshot,
+    Product,
+    ProductHS,
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,63 @@
+"""add_check_summary
+
+Revision ID: c3a7d5e91f04
+Revises: b2cf6e1c1f29
+Create Date: 2025-04-20 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "c3a7d5e91f04"
+down_revision: Union[str, None] = "b2cf6e1c1f29"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "checksummarys",
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column(
+            "counts", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.Column(
+            "statuses",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=False,
+        ),
+        sa.Column(
+            "id",
+            sa.UUID(),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_checksummarys_created_at",
+        "checksummarys",
+        ["created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_checksummarys_created_at", table_name="checksummarys")
+    op.drop_table("checksummarys")
@@ -0,0 +1,70 @@
+"""add_check_indexes
+
+Indexes for the checks of services.help.get_stmt and the admin sorting.
+Built CONCURRENTLY outside of a transaction, so the migration does not
+block writes on a live database. An interrupted build leaves an INVALID
+index: drop it and run the migration again.
+
+Revision ID: d81f6b2c4a17
+Revises: c3a7d5e91f04
+Create Date: 2025-04-25 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d81f6b2c4a17"
+down_revision: Union[str, None] = "c3a7d5e91f04"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, partial index condition
+INDEXES: list[tuple[str, str, list[str], str | None]] = [
+    (
+        "ix_products_active_code_mark_head",
+        "products",
+        ["code_mark_head"],
+        "status <> 'DEDUCTED'",
+    ),
+    (
+        "ix_products_inactive_code_mark_head",
+        "products",
+        ["code_mark_head"],
+        "status IN ('NOT_DEFINED', 'DEDUCTED')",
+    ),
+    ("ix_products_name_id", "products", ["name", "id"], None),
+    ("ix_products_data_in_id", "products", ["data_in", "id"], None),
+    ("ix_products_data_out_id", "products", ["data_out", "id"], None),
+    ("ix_producthss_name_id", "producthss", ["name", "id"], None),
+    ("ix_producthss_data_in_id", "producthss", ["data_in", "id"], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.execute("ANALYZE products")
+        op.execute("ANALYZE producthss")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,55 @@
+"""add_trigram_indexes
+
+GIN trigram indexes for the admin search (ILIKE '%term%').
+Built CONCURRENTLY outside of a transaction, like add_check_indexes.
+
+Revision ID: e5c2a9d7b310
+Revises: d81f6b2c4a17
+Create Date: 2025-05-05 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5c2a9d7b310"
+down_revision: Union[str, None] = "d81f6b2c4a17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table, column
+TRIGRAM_COLUMNS: list[tuple[str, str]] = [
+    ("products", "name"),
+    ("products", "code_mark_head"),
+    ("products", "doc_in"),
+    ("producthss", "name"),
+    ("producthss", "code_mark_head"),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_COLUMNS:
+            op.create_index(
+                f"ix_{table}_{column}_trgm",
+                table,
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in reversed(TRIGRAM_COLUMNS):
+            op.drop_index(
+                f"ix_{table}_{column}_trgm",
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
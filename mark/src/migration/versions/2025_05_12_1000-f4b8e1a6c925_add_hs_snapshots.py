@@ -0,0 +1,62 @@
+"""add_hs_snapshots
+
+Revision ID: f4b8e1a6c925
+Revises: e5c2a9d7b310
+Create Date: 2025-05-12 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "f4b8e1a6c925"
+down_revision: Union[str, None] = "e5c2a9d7b310"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "hssnapshots",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("mode", sa.String(), nullable=False),
+        sa.Column(
+            "members", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.Column(
+            "result", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.Column(
+            "id",
+            sa.UUID(),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_hssnapshots_created_at",
+        "hssnapshots",
+        ["created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_hssnapshots_created_at", table_name="hssnapshots")
+    op.drop_table("hssnapshots")
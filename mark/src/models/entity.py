@@ -1,7 +1,10 @@
 from datetime import date
 from enum import IntEnum
+from typing import Any
 
+from sqlalchemy import Index, String, text
 from sqlalchemy.dialects.postgresql import ENUM as PgEnum
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db.postgres import Base
@@ -9,6 +12,18 @@ from db.postgres import Base
 EMPTY = ""
 
 
+def trigram_index(table: str, column: str) -> Index:
+    """
+    GIN index of pg_trgm for LIKE/ILIKE with any substring.
+    """
+    return Index(
+        f"ix_{table}_{column}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    )
+
+
 class StatusEnum(IntEnum):
     """
     Статусы товара ЧЗ:
@@ -35,6 +50,30 @@ class StatusEnum(IntEnum):
 
 
 class Product(Base):
+    __table_args__ = (
+        # Check hs_base: products not deducted.
+        Index(
+            "ix_products_active_code_mark_head",
+            "code_mark_head",
+            postgresql_where=text("status <> 'DEDUCTED'"),
+        ),
+        # Check hs_hs: products not defined or deducted.
+        Index(
+            "ix_products_inactive_code_mark_head",
+            "code_mark_head",
+            postgresql_where=text("status IN ('NOT_DEFINED', 'DEDUCTED')"),
+        ),
+        # Sorting in the admin.
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_data_in_id", "data_in", "id"),
+        Index("ix_products_data_out_id", "data_out", "id"),
+        # Search in the admin: ILIKE '%term%'.
+        *(
+            trigram_index("products", column)
+            for column in ("name", "code_mark_head", "doc_in")
+        ),
+    )
+
     name: Mapped[str]
     code_work: Mapped[int | None]
     code_hs: Mapped[str]
@@ -86,6 +125,17 @@ class Product(Base):
 
 
 class ProductHS(Base):
+    __table_args__ = (
+        # Sorting in the admin.
+        Index("ix_producthss_name_id", "name", "id"),
+        Index("ix_producthss_data_in_id", "data_in", "id"),
+        # Search in the admin: ILIKE '%term%'.
+        *(
+            trigram_index("producthss", column)
+            for column in ("name", "code_mark_head")
+        ),
+    )
+
     code_mark_head: Mapped[str] = mapped_column(unique=True)
     code_hs: Mapped[str]
     code_customs: Mapped[str]
@@ -117,3 +167,57 @@ class ProductHS(Base):
 
     def __repr__(self) -> str:
         return f"{self.name}: {self.code_mark_head}"
+
+
+class CheckSummary(Base):
+    """
+    Snapshot of the reconciliation: counts by check key and by status.
+    """
+
+    __table_args__ = (Index("ix_checksummarys_created_at", "created_at"),)
+
+    source: Mapped[str]
+    counts: Mapped[dict[str, int]] = mapped_column(JSONB)
+    statuses: Mapped[dict[str, int]] = mapped_column(JSONB)
+
+    def __init__(
+        self,
+        source: str,
+        counts: dict[str, int],
+        statuses: dict[str, int],
+    ) -> None:
+        self.source = source
+        self.counts = counts
+        self.statuses = statuses
+
+    def __repr__(self) -> str:
+        return f"{self.source}: {self.counts}"
+
+
+class HSSnapshot(Base):
+    """
+    Loaded HS archive: SHA-256 of the file, CRC of its CSV files
+    and the result of the load.
+    """
+
+    __table_args__ = (Index("ix_hssnapshots_created_at", "created_at"),)
+
+    sha256: Mapped[str] = mapped_column(String(64))
+    mode: Mapped[str]
+    members: Mapped[dict[str, int]] = mapped_column(JSONB)
+    result: Mapped[dict[str, Any]] = mapped_column(JSONB)
+
+    def __init__(
+        self,
+        sha256: str,
+        mode: str,
+        members: dict[str, int],
+        result: dict[str, Any],
+    ) -> None:
+        self.sha256 = sha256
+        self.mode = mode
+        self.members = members
+        self.result = result
+
+    def __repr__(self) -> str:
+        return f"{self.mode}: {self.sha256}"
@@ -1,13 +1,53 @@
+import asyncio
+import hashlib
 import io
+import os
+import tempfile
 import zipfile
+from contextlib import asynccontextmanager, suppress
 from http import HTTPStatus
+from typing import IO, AsyncIterator, Generator, TypeVar
 
+import aiofiles  # type: ignore[import-untyped, unused-ignore]
 from fastapi import HTTPException, UploadFile
-from sqlalchemy import and_, select
+from sqlalchemy import and_, bindparam, case, exists, select
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.sql.selectable import Select
 
+from api.v1.api_models.products_hs import ProductCheck
+from core.settings import settings
 from models.entity import Product, ProductHS, StatusEnum
 
+T = TypeVar("T")
+
+
+def status_is_not(status: StatusEnum) -> ColumnElement[bool]:
+    """
+    Status filter with the value inlined into SQL, so the planner can use
+    partial indexes by status (a bound parameter can not prove it).
+    """
+    return Product.status != bindparam(
+        None, status, type_=Product.status.type, literal_execute=True
+    )
+
+
+def status_in(statuses: list[StatusEnum]) -> ColumnElement[bool]:
+    return Product.status.in_(
+        bindparam(
+            None,
+            statuses,
+            type_=Product.status.type,
+            expanding=True,
+            literal_execute=True,
+        )
+    )
+
+
+# Products statuses of the checks, partial indexes of products use them.
+ACTIVE_EXCLUDED_STATUS = StatusEnum.DEDUCTED
+INACTIVE_STATUSES = [StatusEnum.NOT_DEFINED, StatusEnum.DEDUCTED]
+
 
 def get_stmt(key: str) -> Select[tuple[Product, ProductHS]]:
     if key == "hs_base":  # Check <is not in the HS> and <is active in the db>.
@@ -19,8 +59,8 @@ def get_stmt(key: str) -> Select[tuple[Product, ProductHS]]:
             )
             .where(
                 and_(
-                    ProductHS.name.is_(None),
-                    Product.status != StatusEnum.DEDUCTED,
+                    ProductHS.code_mark_head.is_(None),
+                    status_is_not(ACTIVE_EXCLUDED_STATUS),
                 )
             )
         )
@@ -31,7 +71,7 @@ def get_stmt(key: str) -> Select[tuple[Product, ProductHS]]:
             .outerjoin(
                 Product, Product.code_mark_head == ProductHS.code_mark_head
             )
-            .where(Product.name.is_(None))
+            .where(Product.code_mark_head.is_(None))
         )
     if key == "hs_hs":  # Check <is in the HS> and <is not active in the db>.
         return (
@@ -39,18 +79,181 @@ def get_stmt(key: str) -> Select[tuple[Product, ProductHS]]:
             .join(
                 ProductHS, Product.code_mark_head == ProductHS.code_mark_head
             )
-            .where(
+            .where(status_in(INACTIVE_STATUSES))
+        )
+    raise HTTPException(
+        HTTPStatus.BAD_REQUEST,
+        "Not valid key",
+    )
+
+
+def get_discrepancy() -> ColumnElement[str | None]:
+    """
+    Key of get_stmt for a row of products FULL JOIN producthss.
+    """
+    return case(
+        (
+            and_(
+                ProductHS.code_mark_head.is_(None),
+                Product.status != StatusEnum.DEDUCTED,
+            ),
+            "hs_base",
+        ),
+        (Product.code_mark_head.is_(None), "base_hs"),
+        (
+            and_(
+                ProductHS.code_mark_head.is_not(None),
                 Product.status.in_(
                     [StatusEnum.NOT_DEFINED, StatusEnum.DEDUCTED]
-                )
-            )
+                ),
+            ),
+            "hs_hs",
+        ),
+    )
+
+
+CHECK_KEYS: tuple[str, ...] = ("hs_base", "base_hs", "hs_hs")
+
+
+def get_full_stmt() -> Select[tuple[Product, ProductHS, str]]:
+    """
+    All check keys in one pass over both tables.
+    """
+    discrepancy = get_discrepancy()
+    return (
+        select(Product, ProductHS, discrepancy.label("discrepancy"))
+        .select_from(Product)
+        .join(
+            ProductHS,
+            Product.code_mark_head == ProductHS.code_mark_head,
+            full=True,
         )
+        .where(discrepancy.is_not(None))
+    )
+
+
+# Status set by applying the check results if it is not given.
+APPLY_STATUSES: dict[str, StatusEnum] = {
+    "hs_hs": StatusEnum.IN_HS_DEDUCTED,
+}
+
+
+def get_apply_filter(key: str) -> list[ColumnElement[bool]]:
+    """
+    Conditions on products of get_stmt(key), for UPDATE products.
+    """
+    if key == "hs_base":
+        return [
+            ~exists().where(
+                ProductHS.code_mark_head == Product.code_mark_head
+            ),
+            status_is_not(ACTIVE_EXCLUDED_STATUS),
+        ]
+    if key == "hs_hs":  # UPDATE ... FROM producthss
+        return [
+            Product.code_mark_head == ProductHS.code_mark_head,
+            status_in(INACTIVE_STATUSES),
+        ]
     raise HTTPException(
         HTTPStatus.BAD_REQUEST,
-        "Not valid key",
+        "Key can not be applied to products",
     )
 
 
+# Keyset of the check results, the side which is always present in the row.
+SORT_COLUMNS: dict[str, InstrumentedAttribute[str]] = {
+    "hs_base": Product.code_mark_head,
+    "base_hs": ProductHS.code_mark_head,
+    "hs_hs": Product.code_mark_head,
+}
+
+
+def get_sort_column(key: str) -> InstrumentedAttribute[str]:
+    if key not in SORT_COLUMNS:
+        raise HTTPException(
+            HTTPStatus.BAD_REQUEST,
+            "Not valid key",
+        )
+    return SORT_COLUMNS[key]
+
+
+def to_product_check(
+    product: Product | None, product_hs: ProductHS | None
+) -> ProductCheck:
+    return ProductCheck(
+        **(
+            {"name": product.name, "code_mark_head": product.code_mark_head}
+            if product
+            else {}
+        ),
+        **(
+            {
+                "name_hs": product_hs.name,
+                "code_mark_head_hs": product_hs.code_mark_head,
+            }
+            if product_hs
+            else {}
+        ),
+    )
+
+
+def find_csv_members(zf: zipfile.ZipFile) -> list[str]:
+    """
+    All CSV files of the archive: large exports are split into parts.
+    """
+    csv_files = sorted(
+        file_csv
+        for file_csv in zf.namelist()
+        if file_csv.lower().endswith(".csv")
+    )
+    if not csv_files:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "В архиве нет CSV файлов")
+    return csv_files
+
+
+def read_csv_members(archive: str | IO[bytes]) -> dict[str, int]:
+    """
+    CRC-32 of the CSV files from the central directory, without reading
+    the files.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        return {
+            member: zf.getinfo(member).CRC for member in find_csv_members(zf)
+        }
+
+
+def read_blocks(
+    file: IO[bytes], block_bytes: int
+) -> Generator[bytes, None, None]:
+    """
+    Reading by blocks of whole CSV rows: a block is not cut inside quotes,
+    so values with line breaks stay in one block. Doubled quotes inside
+    a value keep the count of quotes even.
+    """
+    while block := file.read(block_bytes):
+        block += file.readline()
+        quotes = block.count(b'"')
+        while quotes % 2 and (line := file.readline()):
+            block += line
+            quotes += line.count(b'"')
+        yield block
+
+
+def read_csv_blocks(
+    archive: str | IO[bytes], block_bytes: int
+) -> Generator[tuple[str, bytes], None, None]:
+    """
+    Reading CSV files of the archive by blocks of whole lines, file by file.
+    The first block of every file starts with the filter line and the header.
+    Members are decompressed as a stream.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        for member in find_csv_members(zf):
+            with zf.open(member) as csv_file:
+                for block in read_blocks(csv_file, block_bytes):
+                    yield member, block
+
+
 class FileHandler:
     async def validate_zip(self, file_hs: UploadFile) -> None:
         if not file_hs.filename.lower().endswith(".zip"):
@@ -65,21 +268,90 @@ class FileHandler:
                 f"Ошибка чтения файла: {str(error)}",
             )
 
-    async def extract_csv(self, content_hs: bytes) -> bytes:
+    async def spool_file(self, file_hs: UploadFile) -> tuple[str, str]:
+        """
+        Saving the upload to a temporary file by chunks, SHA-256 of the
+        file is computed on the way. Returns the path and the hash,
+        the caller is responsible for removing the file.
+        """
+        fd, path = tempfile.mkstemp(suffix=".zip")
+        os.close(fd)
+        digest = hashlib.sha256()
         try:
-            with zipfile.ZipFile(io.BytesIO(content_hs)) as zf:
-                csv_files = [
-                    file_csv
-                    for file_csv in zf.namelist()
-                    if file_csv.lower().endswith(".csv")
-                ]
-                if not csv_files:
-                    raise HTTPException(
-                        HTTPStatus.BAD_REQUEST, "В архиве нет CSV файлов"
-                    )
-                with zf.open(csv_files[0]) as csv_file:
-                    return csv_file.read()
+            async with aiofiles.open(path, "wb") as spool:
+                while chunk := await file_hs.read(
+                    settings.HS_UPLOAD_CHUNK_BYTES
+                ):
+                    digest.update(chunk)
+                    await spool.write(chunk)
+        except BaseException as error:
+            # Removed on cancellation too: the caller never gets the path.
+            os.remove(path)
+            if not isinstance(error, Exception):
+                raise
+            raise HTTPException(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                f"Ошибка чтения файла: {str(error)}",
+            )
+        return path, digest.hexdigest()
+
+    @asynccontextmanager
+    async def spooled(
+        self, file_hs: UploadFile
+    ) -> AsyncIterator[tuple[str, str]]:
+        """
+        Validated ZIP upload on disk with its SHA-256, removed on exit.
+        """
+        await self.validate_zip(file_hs)
+        path, sha256 = await self.spool_file(file_hs)
+        try:
+            yield path, sha256
+        finally:
+            os.remove(path)
+
+    async def read_members(self, archive: str | bytes) -> dict[str, int]:
+        source = io.BytesIO(archive) if isinstance(archive, bytes) else archive
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, read_csv_members, source)
+        except HTTPException:
+            raise
         except Exception as error:
             raise HTTPException(
-                HTTPStatus.INTERNAL_SERVER_ERROR, f"Ошибка: {str(error)}"
+                HTTPStatus.BAD_REQUEST, f"Ошибка архива: {str(error)}"
             )
+
+    async def iter_csv_blocks(
+        self, archive: str | bytes, block_bytes: int
+    ) -> AsyncIterator[tuple[str, bytes]]:
+        """
+        Iterating blocks of CSV lines with the file name from the archive
+        on disk (path) or in memory (content).
+        Decompression runs in the thread executor.
+        """
+        source = io.BytesIO(archive) if isinstance(archive, bytes) else archive
+        async for block in self._iterate(read_csv_blocks(source, block_bytes)):
+            yield block
+
+    async def _iterate(
+        self, items: Generator[T, None, None]
+    ) -> AsyncIterator[T]:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    item = await loop.run_in_executor(None, next, items, None)
+                except HTTPException:
+                    raise
+                except Exception as error:
+                    raise HTTPException(
+                        HTTPStatus.INTERNAL_SERVER_ERROR,
+                        f"Ошибка: {str(error)}",
+                    )
+                if item is None:
+                    break
+                yield item
+        finally:
+            # The generator may still run in the executor on cancellation.
+            with suppress(ValueError):
+                items.close()
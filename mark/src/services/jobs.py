@@ -0,0 +1,126 @@
+import asyncio
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable
+from uuid import uuid4
+
+from fastapi import HTTPException
+from pandas import DataFrame
+
+from api.v1.api_models.products_hs import HSJob
+from core.logger import logger
+from core.settings import settings
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+# Stages of a running HS load, in the order they are passed.
+JOB_PARSING = "parsing"
+JOB_LOADING = "loading"
+JOB_APPLYING = "applying"
+JOB_INDEXING = "indexing"
+JOB_SWAPPING = "swapping"
+JOB_SUMMARIZING = "summarizing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_LOAD = "load"
+JOB_SYNC = "sync"
+JOB_RELOAD = "reload"
+JOB_ACCEPT = "accept"
+JOB_MODES = (JOB_LOAD, JOB_SYNC, JOB_RELOAD, JOB_ACCEPT)
+
+# Job of the running task, tasks started by it inherit it.
+current_job: ContextVar[HSJob | None] = ContextVar("current_job", default=None)
+
+
+def set_stage(stage: str) -> None:
+    """
+    Stage of the job of the running task, nothing outside of jobs.
+    """
+    job = current_job.get()
+    if job is not None:
+        job.stage = stage
+
+
+class JobRegistry:
+    """
+    Background jobs of this process. The latest jobs are kept
+    for status requests, the oldest ones are dropped.
+    """
+
+    def __init__(self, keep: int = settings.HS_JOBS_KEEP):
+        self.keep = keep
+        self.jobs: OrderedDict[str, HSJob] = OrderedDict()
+        self.tasks: set[asyncio.Task[None]] = set()
+
+    def create(self, mode: str) -> HSJob:
+        job = HSJob(
+            id=uuid4().hex,
+            mode=mode,
+            stage=JOB_QUEUED,
+            started_at=datetime.now(timezone.utc),
+        )
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.keep:
+            self.jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> HSJob | None:
+        return self.jobs.get(job_id)
+
+    def start(
+        self, job: HSJob, operation: Callable[[], Awaitable[Any]]
+    ) -> None:
+        task = asyncio.create_task(self._run(job, operation))
+        # The loop keeps only weak references to tasks.
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def shutdown(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _run(
+        self, job: HSJob, operation: Callable[[], Awaitable[Any]]
+    ) -> None:
+        job.stage = JOB_RUNNING
+        current_job.set(job)  # The task runs in its own context copy.
+        try:
+            await operation()
+        except HTTPException as error:
+            job.stage = JOB_FAILED
+            job.errors = [error.detail]
+            logger.error(f"Job {job.id} failed: {error.detail}")
+        except asyncio.CancelledError:
+            job.stage = JOB_FAILED
+            job.errors = ["cancelled"]
+            raise
+        except Exception as error:
+            job.stage = JOB_FAILED
+            job.errors = [str(error)]
+            logger.critical(f"Job {job.id} unexpected error: {str(error)}")
+        else:
+            job.stage = JOB_DONE
+            logger.info(f"Job {job.id} done: {job.result}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+
+
+async def track_rows(
+    job: HSJob, frames: AsyncIterator[DataFrame]
+) -> AsyncIterator[DataFrame]:
+    """
+    Progress of the job by rows passed to the database.
+    """
+    async for frame in frames:
+        job.stage = JOB_LOADING
+        job.rows_processed += len(frame)
+        elapsed = (datetime.now(timezone.utc) - job.started_at).total_seconds()
+        if elapsed > 0:
+            job.rows_per_second = round(job.rows_processed / elapsed, 1)
+        yield frame
+
+
+job_registry = JobRegistry()
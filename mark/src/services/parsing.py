@@ -0,0 +1,107 @@
+import csv
+import io
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import pandas as pd
+from pandas import DataFrame
+
+from core.settings import settings
+
+# Spawned workers import this module and the main module of the app
+# (main.py, as __mp_main__): keep their top-level imports light.
+_process_pool: ProcessPoolExecutor | None = None
+
+# Marks rows in the places of lines with a wrong number of fields.
+MALFORMED_COLUMN = "_malformed"
+
+
+def parse_csv_block(
+    block: bytes, csv_params: dict[str, Any], date_columns: list[str]
+) -> DataFrame:
+    """
+    Parsing of a block of CSV lines in a worker process, dates included.
+    Invalid dates become NaT and are reported by the validator.
+    Lines with a wrong number of fields become empty rows marked in
+    MALFORMED_COLUMN, row numbers of the block stay right.
+    """
+    engine = csv_params.get("engine", "c")
+    bad_lines = 0
+    if engine == "pyarrow":
+
+        def skip(_: Any) -> str:
+            nonlocal bad_lines
+            bad_lines += 1
+            return "skip"
+
+        df = pd.read_csv(io.BytesIO(block), **csv_params, on_bad_lines=skip)
+    else:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", pd.errors.ParserWarning)
+            df = pd.read_csv(
+                io.BytesIO(block), **csv_params, on_bad_lines="warn"
+            )
+        bad_lines = sum(
+            str(warning.message).count("Skipping line") for warning in caught
+        )
+    if bad_lines:
+        # pyarrow skips lines with missing fields too, others fill them.
+        df = mark_malformed(df, block, bad_lines, engine == "pyarrow")
+    for column in date_columns:
+        df[column] = pd.to_datetime(
+            df[column], format="ISO8601", utc=True, errors="coerce"
+        )
+    return df
+
+
+def mark_malformed(
+    df: DataFrame, block: bytes, bad_lines: int, short_is_bad: bool
+) -> DataFrame:
+    """
+    Inserts empty malformed rows in the places of the skipped lines,
+    found by the number of fields. If the places can not be matched
+    to the parsed rows, malformed rows are put after them.
+    """
+    text = block.decode("utf-8", errors="replace")
+    records = (row for row in csv.reader(io.StringIO(text, newline="")) if row)
+    fields = len(next(records, []))
+    malformed = [
+        number
+        for number, row in enumerate(records)
+        if len(row) > fields or (short_is_bad and len(row) < fields)
+    ]
+    total = len(df) + bad_lines
+    valid = pd.RangeIndex(total).difference(malformed)
+    if len(malformed) != bad_lines or len(valid) != len(df):
+        valid = pd.RangeIndex(len(df))
+        malformed = list(range(len(df), total))
+    df.index = valid
+    df = df.reindex(pd.RangeIndex(total))
+    df[MALFORMED_COLUMN] = df.index.isin(malformed)
+    return df
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Pool for CPU-bound parsing, created on the first use.
+    Workers are spawned, not forked from the process with the event loop.
+    A pool broken by a died worker is replaced: it fails every new task.
+    """
+    global _process_pool
+    if _process_pool is not None and getattr(_process_pool, "_broken", False):
+        shutdown_process_pool()
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.HS_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
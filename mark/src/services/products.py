@@ -1,15 +1,51 @@
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from datetime import date
 from http import HTTPStatus
 
 from fastapi import Depends, HTTPException
-from sqlalchemy import delete, exists, select
+from sqlalchemy import (
+    Sequence,
+    String,
+    any_,
+    bindparam,
+    delete,
+    exists,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
 
 from api.v1.api_models.products import Product as ProductScheme
-from api.v1.api_models.products import ProductPutch
+from api.v1.api_models.products import ProductPutch, ProductWriteOffResult
+from core.cache import DataVersion, TTLCache
+from core.settings import settings
 from db.postgres import get_session
-from models.entity import Product
+from models.entity import Product, StatusEnum
+from services.summary import (
+    SOURCE_PRODUCTS,
+    SummaryRefresher,
+    summary_refresher,
+)
+
+# Products by QR, None for unknown QR.
+product_cache: TTLCache[str, Product | None] = TTLCache(
+    settings.QR_CACHE_SIZE, settings.QR_CACHE_TTL
+)
+
+# Bumped by every write to products, a part of the check cache key.
+products_version = DataVersion()
+
+
+def code_in(codes: list[str]) -> ColumnElement[bool]:
+    """
+    Filter by QR codes with one array parameter: code = ANY($1).
+    """
+    return Product.code_mark_head == any_(
+        bindparam("codes", codes, type_=ARRAY(String))
+    )
 
 
 class AbstractProductRepository(ABC):
@@ -21,6 +57,16 @@ class AbstractProductRepository(ABC):
         """
         ...
 
+    @abstractmethod
+    async def create_products(
+        self, products: list[ProductScheme]
+    ) -> list[str]:
+        """
+        Method for creating products, existing QR are skipped.
+        Returns QR of created products.
+        """
+        ...
+
     @abstractmethod
     async def get_product_by_qr(self, product_qr: str) -> Product | None:
         """
@@ -28,6 +74,13 @@ class AbstractProductRepository(ABC):
         """
         ...  # noqa: WPS463
 
+    @abstractmethod
+    async def get_products_by_qr(self, codes: list[str]) -> Sequence[Product]:
+        """
+        Method for getting products data by the list of QR.
+        """
+        ...
+
     @abstractmethod
     async def del_product_by_qr(self, product_qr: str) -> None:
         """
@@ -44,6 +97,15 @@ class AbstractProductRepository(ABC):
         """
         ...
 
+    @abstractmethod
+    async def write_off(
+        self, codes: list[str], doc_out: str, data_out: date | None
+    ) -> ProductWriteOffResult:
+        """
+        Method for deducting products by the outgoing document.
+        """
+        ...
+
     @abstractmethod
     async def del_products(self) -> None:
         """
@@ -75,6 +137,22 @@ class ProductRepository(AbstractProductRepository):
 
         return new_product
 
+    async def create_products(
+        self, products: list[ProductScheme]
+    ) -> list[str]:
+        stmt = (
+            pg_insert(Product.__table__)
+            .on_conflict_do_nothing(index_elements=[Product.code_mark_head])
+            .returning(Product.code_mark_head)
+        )
+        # executemany form, batched by SQLAlchemy "insertmanyvalues"
+        created = await self.session.scalars(
+            stmt, [product.model_dump() for product in products]
+        )
+        codes = list(created)
+        await self.session.commit()
+        return codes
+
     async def get_product_by_qr(self, product_qr: str) -> Product | None:
         product_result = await self.session.execute(
             select(Product).filter(Product.code_mark_head == product_qr)
@@ -84,6 +162,12 @@ class ProductRepository(AbstractProductRepository):
             return None
         return product  # type: ignore
 
+    async def get_products_by_qr(self, codes: list[str]) -> Sequence[Product]:
+        product_result = await self.session.execute(
+            select(Product).where(code_in(codes))
+        )
+        return product_result.scalars().all()
+
     async def del_product_by_qr(self, product_qr: str) -> None:
         product_result = await self.session.execute(
             select(Product).filter(Product.code_mark_head == product_qr)
@@ -118,22 +202,161 @@ class ProductRepository(AbstractProductRepository):
         await self.session.refresh(priduct_upd)
         return priduct_upd  # type: ignore
 
+    async def write_off(
+        self, codes: list[str], doc_out: str, data_out: date | None
+    ) -> ProductWriteOffResult:
+        stmt = (
+            update(Product)
+            .where(code_in(codes), Product.status != StatusEnum.DEDUCTED)
+            .values(
+                status=StatusEnum.DEDUCTED, doc_out=doc_out, data_out=data_out
+            )
+            .returning(Product.code_mark_head)
+            .execution_options(synchronize_session=False)
+        )
+        deducted = set(await self.session.scalars(stmt))
+        rest = [code for code in codes if code not in deducted]
+        existing: set[str] = set()
+        if rest:
+            existing = set(
+                await self.session.scalars(
+                    select(Product.code_mark_head).where(code_in(rest))
+                )
+            )
+        await self.session.commit()
+        return ProductWriteOffResult(
+            deducted=len(deducted),
+            not_found=[code for code in rest if code not in existing],
+            already_deducted=[code for code in rest if code in existing],
+        )
+
     async def del_products(self) -> None:
         stmt = delete(Product)
         await self.session.execute(stmt)
         await self.session.commit()
 
 
+class CachedProductRepository(AbstractProductRepository):
+    """
+    Caching of products by QR in front of the repository.
+    Writes through this repository invalidate the cached QR after
+    the write and bump the version of products. A read which overlaps
+    a write is not cached: the version has changed while it ran.
+    """
+
+    def __init__(
+        self,
+        repository: AbstractProductRepository,
+        cache: TTLCache[str, Product | None],
+        version: DataVersion = products_version,
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.version = version
+
+    async def create_product(self, product: ProductScheme) -> Product:
+        try:
+            return await self.repository.create_product(product)
+        finally:
+            self._written(product.code_mark_head)
+
+    async def create_products(
+        self, products: list[ProductScheme]
+    ) -> list[str]:
+        codes = [product.code_mark_head for product in products]
+        try:
+            return await self.repository.create_products(products)
+        finally:
+            self._written(*codes)
+
+    async def get_product_by_qr(self, product_qr: str) -> Product | None:
+        is_cached, product = self.cache.get(product_qr)
+        if is_cached:
+            return product
+        version = self.version.value
+        product = await self.repository.get_product_by_qr(product_qr)
+        if self.version.value == version:
+            self.cache.set(product_qr, product)
+        return product
+
+    async def get_products_by_qr(self, codes: list[str]) -> Sequence[Product]:
+        return await self.repository.get_products_by_qr(codes)
+
+    async def del_product_by_qr(self, product_qr: str) -> None:
+        try:
+            await self.repository.del_product_by_qr(product_qr)
+        finally:
+            self._written(product_qr)
+
+    async def update_product(
+        self, product_qr: str, product: ProductPutch
+    ) -> Product:
+        try:
+            return await self.repository.update_product(product_qr, product)
+        finally:
+            self._written(product_qr)
+
+    async def write_off(
+        self, codes: list[str], doc_out: str, data_out: date | None
+    ) -> ProductWriteOffResult:
+        try:
+            return await self.repository.write_off(codes, doc_out, data_out)
+        finally:
+            self._written(*codes)
+
+    async def del_products(self) -> None:
+        try:
+            await self.repository.del_products()
+        finally:
+            self.cache.clear()
+            self.version.bump()
+
+    def _written(self, *codes: str) -> None:
+        self.cache.invalidate(*codes)
+        self.version.bump()
+
+
 class ProductService:
-    def __init__(self, repository: AbstractProductRepository):
+    def __init__(
+        self,
+        repository: AbstractProductRepository,
+        summary: SummaryRefresher | None = None,
+    ):
         self.repository = repository
+        self.summary = summary
 
     async def get_product_by_qr(self, product_qr: str) -> Product | None:
         return await self.repository.get_product_by_qr(product_qr)
 
+    async def get_products_by_qr(
+        self, codes: list[str]
+    ) -> tuple[Sequence[Product], list[str]]:
+        """
+        Returns found products and codes which are not found.
+        """
+        codes = list(dict.fromkeys(codes))
+        products = await self.repository.get_products_by_qr(codes)
+        found = {product.code_mark_head for product in products}
+        return products, [code for code in codes if code not in found]
+
     async def create_product(self, product: ProductScheme) -> Product:
         return await self.repository.create_product(product)
 
+    async def create_products(
+        self, products: list[ProductScheme]
+    ) -> tuple[list[str], list[str]]:
+        """
+        Returns created QR and QR which already exist.
+        """
+        created = set(await self.repository.create_products(products))
+        if created:
+            self._refresh_summary()
+        codes = dict.fromkeys(product.code_mark_head for product in products)
+        return (
+            [code for code in codes if code in created],
+            [code for code in codes if code not in created],
+        )
+
     async def del_product_by_qr(self, product_qr: str) -> None:
         await self.repository.del_product_by_qr(product_qr)
 
@@ -142,13 +365,32 @@ class ProductService:
     ) -> Product:
         return await self.repository.update_product(product_qr, product)
 
+    async def write_off(
+        self, codes: list[str], doc_out: str, data_out: date | None
+    ) -> ProductWriteOffResult:
+        result = await self.repository.write_off(
+            list(dict.fromkeys(codes)), doc_out, data_out
+        )
+        if result.deducted:
+            self._refresh_summary()
+        return result
+
     async def del_products(self) -> None:
-        return await self.repository.del_products()
+        await self.repository.del_products()
+        self._refresh_summary()
+
+    def _refresh_summary(self) -> None:
+        """
+        The summary is refreshed in the background after the request.
+        """
+        if self.summary is not None:
+            self.summary.schedule(SOURCE_PRODUCTS)
 
 
-@lru_cache()
 def get_product_service(
     session: AsyncSession = Depends(get_session),
 ) -> ProductService:
-    repository = ProductRepository(session)
-    return ProductService(repository)
+    repository = CachedProductRepository(
+        ProductRepository(session), product_cache
+    )
+    return ProductService(repository, summary_refresher)
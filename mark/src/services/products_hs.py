@@ -1,15 +1,44 @@
 import asyncio
+import csv
+import hashlib
 import io
+import os
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from collections import deque
 from http import HTTPStatus
-from typing import Any, Awaitable, Callable, Type, TypeAlias
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Type,
+    TypeAlias,
+    TypeVar,
+)
+from uuid import uuid4
 
+import asyncpg
 import pandas as pd
 from fastapi import Depends, HTTPException, UploadFile
 from pandas import DataFrame
-from pydantic import ValidationError
-from sqlalchemy import Row, Sequence, delete, insert
+from sqlalchemy import (
+    Boolean,
+    Column,
+    MetaData,
+    Row,
+    Sequence,
+    Table,
+    delete,
+    exists,
+    func,
+    literal_column,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Result
 from sqlalchemy.exc import (
     DataError,
     IntegrityError,
@@ -19,15 +48,145 @@ from sqlalchemy.exc import (
     SQLAlchemyError,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql import Executable
 from sqlalchemy.sql.dml import UpdateBase, ValuesBase
+from sqlalchemy.sql.elements import ColumnElement
 
-from api.v1.api_models.products_hs import ProductHSModel
+from api.v1.api_models.products_hs import (
+    CheckApplyResult,
+    HSAcceptResult,
+    HSJob,
+    HSLoadResult,
+    HSSyncResult,
+    ProductCheck,
+    ProductCheckAll,
+    ProductCheckPage,
+)
+from core.cache import DataVersion, TTLCache
 from core.logger import logger
-from db.postgres import get_session
-from models.entity import Product, ProductHS
-from services.help import FileHandler, get_stmt
+from core.settings import settings
+from db.postgres import async_session, get_session
+from models.entity import Product, ProductHS, StatusEnum
+from services.help import (
+    APPLY_STATUSES,
+    CHECK_KEYS,
+    FileHandler,
+    get_apply_filter,
+    get_full_stmt,
+    get_sort_column,
+    get_stmt,
+    to_product_check,
+)
+from services.jobs import (
+    JOB_ACCEPT,
+    JOB_APPLYING,
+    JOB_INDEXING,
+    JOB_LOAD,
+    JOB_MODES,
+    JOB_PARSING,
+    JOB_RELOAD,
+    JOB_SUMMARIZING,
+    JOB_SWAPPING,
+    JOB_SYNC,
+    job_registry,
+    set_stage,
+    track_rows,
+)
+from services.parsing import get_process_pool, parse_csv_block
+from services.products import product_cache, products_version
+from services.rejects import RejectReport
+from services.snapshots import SnapshotRepository, SnapshotService
+from services.summary import (
+    SOURCE_HS_CLEAR,
+    SOURCE_HS_LOAD,
+    SOURCE_HS_RELOAD,
+    SOURCE_HS_SYNC,
+    SOURCE_PRODUCTS,
+    SummaryRepository,
+    SummaryService,
+)
+from services.validation import (
+    HS_COLUMNS,
+    HS_DATE_COLUMN,
+    REASON_DUPLICATE,
+    HSFrameValidator,
+)
 
 IncorrectData: TypeAlias = Sequence[Row[tuple[Product, ProductHS]]]
+ClassifiedData: TypeAlias = Sequence[Row[tuple[Product, ProductHS, str]]]
+CheckCacheKey: TypeAlias = tuple[str, int, int]
+T = TypeVar("T")
+
+# Bumped by every load of the HS data, a part of the check cache key.
+hs_version = DataVersion()
+# Check results by (key, HS version, products version), bounded by rows.
+check_cache: TTLCache[CheckCacheKey, list[ProductCheck]] = TTLCache(
+    settings.CHECK_CACHE_MAX_ROWS, settings.CHECK_CACHE_TTL, weigh=len
+)
+
+HS_TABLE = ProductHS.__table__
+# Incoming snapshot for the sync, dropped at the end of the transaction.
+hs_incoming = Table(
+    "producthss_incoming",
+    MetaData(),
+    *(Column(column, HS_TABLE.c[column].type) for column in HS_COLUMNS),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+# Frame of the partial load, emptied by every commit.
+hs_accepted = Table(
+    "producthss_accepted",
+    MetaData(),
+    *(Column(column, HS_TABLE.c[column].type) for column in HS_COLUMNS),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+# Errors of single rows in the partial load, not of the whole load.
+ROW_ERRORS: tuple[Type[Exception], ...] = (
+    DataError,
+    IntegrityError,
+    asyncpg.DataError,
+    asyncpg.IntegrityConstraintViolationError,
+)
+REASON_DATABASE = "database"
+HS_STAGING_TABLE = f"{HS_TABLE.name}_staging"
+HS_INDEXES_QUERY = text(
+    """
+    SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid),
+        pg_constraint.contype
+    FROM pg_index
+    JOIN pg_class AS index_class ON index_class.oid = pg_index.indexrelid
+    LEFT JOIN pg_constraint ON pg_constraint.conindid = pg_index.indexrelid
+        AND pg_constraint.conrelid = pg_index.indrelid
+    WHERE pg_index.indrelid = CAST(:table_name AS regclass)
+    """
+)
+CONSTRAINT_TYPES: dict[str, str] = {"p": "PRIMARY KEY", "u": "UNIQUE"}
+
+
+def create_copy_table(table_name: str) -> str:
+    """
+    Unlogged table without indexes with columns and defaults of the table.
+    """
+    return (
+        f"CREATE UNLOGGED TABLE {table_name} "
+        f"(LIKE {HS_TABLE.name} INCLUDING DEFAULTS)"
+    )
+
+
+async def feed_queue(
+    frames: AsyncIterator[DataFrame],
+    queue: asyncio.Queue[DataFrame | None],
+    consumers: int,
+) -> None:
+    """
+    Frames to the queue, then the end mark for every consumer.
+    """
+    async for df in frames:
+        await queue.put(df)
+    for _ in range(consumers):
+        await queue.put(None)
 
 
 class AbstractProductHSRepository(ABC):
@@ -39,6 +198,40 @@ class AbstractProductHSRepository(ABC):
         """
         ...
 
+    @abstractmethod
+    async def load_frames(self, frames: AsyncIterator[DataFrame]) -> int:
+        """
+        Method for load data from DataFrame chunks in one transaction.
+        """
+        ...
+
+    @abstractmethod
+    async def accept_frames(
+        self, frames: AsyncIterator[DataFrame], report: RejectReport
+    ) -> int:
+        """
+        Method for loading valid rows by frames, the rest go to the report.
+        Returns the number of loaded rows.
+        """
+        ...
+
+    @abstractmethod
+    async def sync_frames(
+        self, frames: AsyncIterator[DataFrame], force: bool = False
+    ) -> HSSyncResult:
+        """
+        Method for sync table with the snapshot from DataFrame chunks.
+        Without force a sync removing too many codes is refused.
+        """
+        ...
+
+    @abstractmethod
+    async def reload_frames(self, frames: AsyncIterator[DataFrame]) -> int:
+        """
+        Method for replace table data with DataFrame chunks atomically.
+        """
+        ...
+
     @abstractmethod
     async def clear(self) -> None:
         """
@@ -46,6 +239,16 @@ class AbstractProductHSRepository(ABC):
         """
         ...
 
+    @abstractmethod
+    async def apply_check(
+        self, key: str, status: StatusEnum, dry_run: bool
+    ) -> int:
+        """
+        Method for setting the status of products found by the check.
+        Returns the number of affected products.
+        """
+        ...
+
     @abstractmethod
     async def get_incorrect(self, key: str) -> IncorrectData:
         """
@@ -53,18 +256,75 @@ class AbstractProductHSRepository(ABC):
         """
         ...
 
+    @abstractmethod
+    async def get_incorrect_all(self) -> ClassifiedData:
+        """
+        Method for check table by all keys in one pass.
+        """
+        ...
+
+    @abstractmethod
+    async def get_incorrect_page(
+        self, key: str, limit: int, after: str | None
+    ) -> IncorrectData:
+        """
+        Method for check table by pages ordered by QR.
+        """
+        ...
+
+    @abstractmethod
+    async def count_incorrect(self, key: str) -> int:
+        """
+        Method for count of check results.
+        """
+        ...
+
+    @abstractmethod
+    def stream_incorrect(self, key: str) -> AsyncIterator[IncorrectData]:
+        """
+        Method for check table by batches from a server-side cursor.
+        """
+        ...
+
 
 class ProductHSRepository(AbstractProductHSRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.validator = HSFrameValidator()
 
     async def load_data(self, df: DataFrame) -> None:
+        await self._handle_database_errors(lambda: self._copy_and_commit(df))
 
-        prods_hs: list[dict[str, Any]] = df.to_dict(orient="records")
-        validated_prods = await self._validate_data(prods_hs)
-        stmt = insert(ProductHS).values(validated_prods)
-        await self._handle_database_errors(
-            lambda: self._execute_and_commit(stmt)
+    async def load_frames(self, frames: AsyncIterator[DataFrame]) -> int:
+        if settings.HS_LOAD_CONNECTIONS > 1:
+            return await self._handle_database_errors(
+                lambda: self._load_parallel(frames)
+            )
+        return await self._handle_database_errors(
+            lambda: self._copy_frames_and_commit(frames)
+        )
+
+    async def accept_frames(
+        self, frames: AsyncIterator[DataFrame], report: RejectReport
+    ) -> int:
+        return await self._handle_database_errors(
+            lambda: self._accept_frames(frames, report)
+        )
+
+    async def sync_frames(
+        self, frames: AsyncIterator[DataFrame], force: bool = False
+    ) -> HSSyncResult:
+        return await self._handle_database_errors(
+            lambda: self._sync_and_commit(frames, force)
+        )
+
+    async def reload_frames(self, frames: AsyncIterator[DataFrame]) -> int:
+        if settings.HS_LOAD_CONNECTIONS > 1:
+            return await self._handle_database_errors(
+                lambda: self._reload_parallel(frames)
+            )
+        return await self._handle_database_errors(
+            lambda: self._reload_and_commit(frames)
         )
 
     async def clear(self) -> None:
@@ -73,38 +333,489 @@ class ProductHSRepository(AbstractProductHSRepository):
             lambda: self._execute_and_commit(stmt)
         )
 
+    async def apply_check(
+        self, key: str, status: StatusEnum, dry_run: bool
+    ) -> int:
+        conditions = [*get_apply_filter(key), Product.status != status]
+        if dry_run:
+            stmt = select(func.count()).select_from(Product).where(*conditions)
+            count = await self._execute_query(stmt)
+            return count.scalar_one()  # type: ignore[no-any-return]
+        return await self._handle_database_errors(
+            lambda: self._apply_and_commit(conditions, status)
+        )
+
     async def get_incorrect(self, key: str) -> IncorrectData:
         stmt = get_stmt(key)
+        difference = await self._execute_query(stmt)
+        return difference.all()
+
+    async def get_incorrect_all(self) -> ClassifiedData:
+        difference = await self._execute_query(get_full_stmt())
+        return difference.all()
+
+    async def get_incorrect_page(
+        self, key: str, limit: int, after: str | None
+    ) -> IncorrectData:
+        stmt = get_stmt(key)
+        sort_column = get_sort_column(key)
+        stmt = stmt.order_by(sort_column).limit(limit)
+        if after is not None:
+            stmt = stmt.where(sort_column > after)
+        difference = await self._execute_query(stmt)
+        return difference.all()
+
+    async def count_incorrect(self, key: str) -> int:
+        stmt = select(func.count()).select_from(get_stmt(key).subquery())
+        count = await self._execute_query(stmt)
+        return count.scalar_one()  # type: ignore[no-any-return]
+
+    async def stream_incorrect(self, key: str) -> AsyncIterator[IncorrectData]:
+        stmt = get_stmt(key).execution_options(
+            yield_per=settings.CHECK_EXPORT_BATCH_ROWS
+        )
+        # Own session: the request session is closed before the
+        # streaming response body is sent.
+        async with async_session() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                yield rows
+
+    async def _execute_query(self, stmt: Executable) -> Result[Any]:
         try:
-            difference = await self.session.execute(stmt)
+            return await self.session.execute(stmt)
         except SQLAlchemyError as error:
             await self.session.rollback()
             raise HTTPException(
                 HTTPStatus.INTERNAL_SERVER_ERROR,
                 f"Ошибка базы данных: {str(error)}",
             )
-        return difference.all()
 
     async def _execute_and_commit(self, stmt: ValuesBase | UpdateBase) -> None:
         await self.session.execute(stmt)
         await self.session.commit()
 
-    async def _validate_data(
-        self, prods_hs: list[dict[str, Any]]
-    ) -> list[dict[str, Any]]:
+    async def _apply_and_commit(
+        self, conditions: list[ColumnElement[bool]], status: StatusEnum
+    ) -> int:
+        stmt = (
+            update(Product)
+            .where(*conditions)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(stmt)
+        await self.session.commit()
+        return result.rowcount  # type: ignore[no-any-return]
+
+    async def _copy_and_commit(self, df: DataFrame) -> None:
+        await self._copy_data(df)
+        await self.session.commit()
+
+    async def _copy_frames_and_commit(
+        self, frames: AsyncIterator[DataFrame]
+    ) -> int:
+        processed = 0
+        async for df in frames:
+            processed += await self._copy_data(df)
+        await self.session.commit()
+        return processed
+
+    async def _accept_frames(
+        self, frames: AsyncIterator[DataFrame], report: RejectReport
+    ) -> int:
+        """
+        Partial load: every frame is committed separately, invalid rows
+        and duplicates of the frame are rejected before COPY.
+        """
+        accepted = 0
+        async for df in frames:
+            valid, rejected = self.validator.split(df)
+            for (column, reason), frame in rejected.items():
+                await report.add(frame, column, reason)
+            accepted += await self._accept_and_commit(valid, report)
+        return accepted
+
+    async def _accept_and_commit(
+        self, df: DataFrame, report: RejectReport
+    ) -> int:
+        """
+        INSERT ... ON CONFLICT DO NOTHING from the temporary table: codes
+        loaded earlier are rejected as duplicates. On a row error the
+        frame is rolled back and loaded by halves down to the bad row.
+        """
+        if df.empty:
+            return 0
         try:
-            return [
-                ProductHSModel(**prod_hs).model_dump() for prod_hs in prods_hs
-            ]
-        except ValidationError as error:
-            logger.error(f"Validation failed: {error.json()}")
+            await self.session.execute(
+                CreateTable(hs_accepted, if_not_exists=True)
+            )
+            await self._copy_frame(df, hs_accepted.name)
+            duplicates = await self._insert_accepted()
+            await self.session.commit()
+        except ROW_ERRORS as error:
+            await self.session.rollback()
+            if len(df) == 1:
+                logger.error(f"Row {df.index[0] + 1} rejected: {error}")
+                await report.add(df, "", REASON_DATABASE)
+                return 0
+            middle = len(df) // 2
+            return await self._accept_and_commit(
+                df.iloc[:middle], report
+            ) + await self._accept_and_commit(df.iloc[middle:], report)
+        code = HS_COLUMNS[0]
+        duplicate = df[df[code].isin(duplicates)]
+        await report.add(duplicate, code, REASON_DUPLICATE)
+        return len(df) - len(duplicate)
+
+    async def _insert_accepted(self) -> list[str]:
+        """
+        Returns codes of the temporary table which are already loaded.
+        """
+        stmt = (
+            pg_insert(HS_TABLE)
+            .from_select(
+                [*HS_COLUMNS, HS_TABLE.c.id.name],
+                select(
+                    *(hs_accepted.c[column] for column in HS_COLUMNS),
+                    func.gen_random_uuid(),
+                ),
+            )
+            .on_conflict_do_nothing(index_elements=[HS_TABLE.c.code_mark_head])
+        )
+        inserted = stmt.returning(HS_TABLE.c.code_mark_head).cte("inserted")
+        duplicates = await self.session.execute(
+            select(hs_accepted.c.code_mark_head).where(
+                ~exists().where(
+                    inserted.c.code_mark_head == hs_accepted.c.code_mark_head
+                )
+            )
+        )
+        return list(duplicates.scalars())
+
+    async def _sync_and_commit(
+        self, frames: AsyncIterator[DataFrame], force: bool
+    ) -> HSSyncResult:
+        await self.session.execute(CreateTable(hs_incoming))
+        processed = 0
+        async for df in frames:
+            processed += await self._copy_data(df, hs_incoming.name)
+        if not processed:
             raise HTTPException(
-                HTTPStatus.UNPROCESSABLE_ENTITY, "Некорректные данные"
-            ) from error
+                HTTPStatus.BAD_REQUEST,
+                "Пустая выгрузка: синхронизация удалила бы все коды",
+            )
+        if not force:
+            await self._check_missing()
+        set_stage(JOB_APPLYING)
+        inserted, updated = await self._upsert_incoming()
+        removed = await self._remove_missing()
+        await self.session.commit()
+        return HSSyncResult(
+            processed=processed,
+            inserted=inserted,
+            updated=updated,
+            removed=removed,
+        )
 
-    async def _handle_database_errors(
-        self, operation: Callable[[], Awaitable[None]]
+    async def _check_missing(self) -> None:
+        """
+        Refuses the sync if it would remove more than
+        HS_SYNC_MAX_REMOVED_SHARE of the table, e.g. for a partial export.
+        """
+        counts = await self.session.execute(
+            select(
+                func.count(),
+                func.count().filter(
+                    ~exists().where(
+                        hs_incoming.c.code_mark_head
+                        == HS_TABLE.c.code_mark_head
+                    )
+                ),
+            ).select_from(HS_TABLE)
+        )
+        total, missing = counts.one()
+        if missing > settings.HS_SYNC_MAX_REMOVED_SHARE * total:
+            raise HTTPException(
+                HTTPStatus.CONFLICT,
+                f"Синхронизация удалит {missing} из {total} кодов, "
+                "для подтверждения повторите с force=true",
+            )
+
+    async def _upsert_incoming(self) -> tuple[int, int]:
+        """
+        Insert of new codes and update of changed ones.
+        Returns counts of inserted and updated rows.
+        """
+        data_columns = HS_COLUMNS[1:]
+        # id is generated per row, the python-side default would be
+        # rendered as one parameter for the whole INSERT ... SELECT.
+        # The first row of a repeated code is kept, as in the partial
+        # load: rows of the new temporary table are in the COPY order.
+        incoming = (
+            select(
+                *(hs_incoming.c[column] for column in HS_COLUMNS),
+                func.gen_random_uuid(),
+            )
+            .distinct(hs_incoming.c.code_mark_head)
+            .order_by(hs_incoming.c.code_mark_head, literal_column("ctid"))
+        )
+        stmt = pg_insert(HS_TABLE).from_select(
+            [*HS_COLUMNS, HS_TABLE.c.id.name], incoming
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HS_TABLE.c.code_mark_head],
+            set_={
+                **{column: stmt.excluded[column] for column in data_columns},
+                "updated_at": func.now(),
+            },
+            where=tuple_(
+                *(HS_TABLE.c[column] for column in data_columns)
+            ).is_distinct_from(
+                tuple_(*(stmt.excluded[column] for column in data_columns))
+            ),
+        )
+        # xmax is zero only for rows inserted by the statement.
+        upserted = stmt.returning(
+            literal_column("xmax = 0", Boolean).label("inserted")
+        ).cte("upserted")
+        counts = await self.session.execute(
+            select(
+                func.count().filter(upserted.c.inserted),
+                func.count().filter(~upserted.c.inserted),
+            )
+        )
+        inserted, updated = counts.one()
+        return inserted, updated
+
+    async def _remove_missing(self) -> int:
+        stmt = delete(HS_TABLE).where(
+            ~exists().where(
+                hs_incoming.c.code_mark_head == HS_TABLE.c.code_mark_head
+            )
+        )
+        result = await self.session.execute(stmt)
+        return result.rowcount  # type: ignore[no-any-return]
+
+    async def _reload_and_commit(
+        self, frames: AsyncIterator[DataFrame]
+    ) -> int:
+        """
+        Load into an unlogged staging table without indexes, then build
+        the indexes and swap the tables in the same transaction.
+        Readers keep seeing the old table until the commit. A staging
+        table left by a crashed parallel reload is dropped first.
+        """
+        await self._lock_staging()
+        await self.session.execute(
+            text(f"DROP TABLE IF EXISTS {HS_STAGING_TABLE}")
+        )
+        await self.session.execute(text(create_copy_table(HS_STAGING_TABLE)))
+        processed = 0
+        async for df in frames:
+            processed += await self._copy_data(df, HS_STAGING_TABLE)
+        await self._swap_and_commit()
+        return processed
+
+    async def _reload_parallel(self, frames: AsyncIterator[DataFrame]) -> int:
+        """
+        Reload with the staging table filled over several connections.
+        The table is created and filled in own committed sessions, the
+        swap is done in the locked transaction as in the one-session
+        reload, so readers see the old table until the commit.
+        """
+        await self._lock_staging()
+        await self._execute_apart(
+            f"DROP TABLE IF EXISTS {HS_STAGING_TABLE}",
+            create_copy_table(HS_STAGING_TABLE),
+        )
+        try:
+            processed = await self._copy_parallel(frames, HS_STAGING_TABLE)
+            await self._swap_and_commit()
+        except BaseException:
+            await self._discard_table(HS_STAGING_TABLE)
+            raise
+        return processed
+
+    async def _load_parallel(self, frames: AsyncIterator[DataFrame]) -> int:
+        """
+        Load over several connections into an unlogged table of this
+        load, then one INSERT ... SELECT: readers see all rows or none.
+        """
+        table_name = f"{HS_TABLE.name}_load_{uuid4().hex}"
+        await self._execute_apart(create_copy_table(table_name))
+        try:
+            processed = await self._copy_parallel(frames, table_name)
+            set_stage(JOB_APPLYING)
+            await self.session.execute(
+                text(f"INSERT INTO {HS_TABLE.name} SELECT * FROM {table_name}")
+            )
+            await self.session.execute(text(f"DROP TABLE {table_name}"))
+            await self.session.commit()
+        except BaseException:
+            await self._discard_table(table_name)
+            raise
+        return processed
+
+    async def _copy_parallel(
+        self, frames: AsyncIterator[DataFrame], table_name: str
+    ) -> int:
+        """
+        Frames are validated and copied by HS_LOAD_CONNECTIONS writers
+        with own sessions. Every writer commits at the end, an error of
+        any writer cancels the others.
+        """
+        connections = settings.HS_LOAD_CONNECTIONS
+        queue: asyncio.Queue[DataFrame | None] = asyncio.Queue(connections)
+        try:
+            async with asyncio.TaskGroup() as group:
+                writers = [
+                    group.create_task(self._copy_writer(queue, table_name))
+                    for _ in range(connections)
+                ]
+                group.create_task(feed_queue(frames, queue, connections))
+        except ExceptionGroup as error:
+            raise error.exceptions[0]
+        return sum(writer.result() for writer in writers)
+
+    async def _copy_writer(
+        self, queue: asyncio.Queue[DataFrame | None], table_name: str
+    ) -> int:
+        async with async_session() as session:
+            writer = type(self)(session)
+            copied = 0
+            while (df := await queue.get()) is not None:
+                copied += await writer._copy_data(df, table_name)
+            await session.commit()
+        return copied
+
+    async def _execute_apart(self, *statements: str) -> None:
+        """
+        DDL committed in its own session, visible to the writers.
+        """
+        async with async_session() as session:
+            for statement in statements:
+                await session.execute(text(statement))
+            await session.commit()
+
+    async def _discard_table(self, table_name: str) -> None:
+        """
+        Drop of the copy table after a failed load. The transaction is
+        rolled back first: it may hold locks on the table. The staging
+        table is shared by reloads and is dropped under their lock.
+        """
+        await self.session.rollback()
+        if table_name == HS_STAGING_TABLE:
+            await self._lock_staging()
+        await self.session.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        await self.session.commit()
+
+    async def _lock_staging(self) -> None:
+        await self.session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:lock_name))"),
+            {"lock_name": HS_STAGING_TABLE},
+        )
+
+    async def _swap_and_commit(self) -> None:
+        """
+        The table is made logged before the indexes are built: SET LOGGED
+        rewrites the table with its indexes, built ones would be written
+        twice. Statistics are collected before the commit, the first
+        queries of the new table are planned on them.
+        Grants and comments of the replaced table are not carried over,
+        they belong to the dropped table.
+        """
+        await self.session.execute(
+            text(f"ALTER TABLE {HS_STAGING_TABLE} SET LOGGED")
+        )
+        set_stage(JOB_INDEXING)
+        index_names = await self._build_staging_indexes()
+        set_stage(JOB_SWAPPING)
+        await self._swap_staging(index_names)
+        await self.session.execute(text(f"ANALYZE {HS_TABLE.name}"))
+        await self.session.commit()
+
+    async def _build_staging_indexes(self) -> dict[str, str]:
+        """
+        Creates on the staging table copies of the table indexes
+        and constraints. Returns staging index names mapped to names.
+        """
+        indexes = await self.session.execute(
+            HS_INDEXES_QUERY, {"table_name": HS_TABLE.name}
+        )
+        index_names: dict[str, str] = {}
+        for name, definition, constraint_type in indexes.all():
+            staging_name = f"{name}_staging"
+            create_index = definition.partition(" ON ")[0]
+            method = definition.partition(" USING ")[2]
+            await self.session.execute(
+                text(
+                    f"{create_index.removesuffix(name)}{staging_name} "
+                    f"ON {HS_STAGING_TABLE} USING {method}"
+                )
+            )
+            if constraint_type in CONSTRAINT_TYPES:
+                await self.session.execute(
+                    text(
+                        f"ALTER TABLE {HS_STAGING_TABLE} "
+                        f"ADD CONSTRAINT {staging_name} "
+                        f"{CONSTRAINT_TYPES[constraint_type]} "
+                        f"USING INDEX {staging_name}"
+                    )
+                )
+            index_names[staging_name] = name
+        return index_names
+
+    async def _swap_staging(self, index_names: dict[str, str]) -> None:
+        await self.session.execute(text(f"DROP TABLE {HS_TABLE.name}"))
+        await self.session.execute(
+            text(f"ALTER TABLE {HS_STAGING_TABLE} RENAME TO {HS_TABLE.name}")
+        )
+        for staging_name, name in index_names.items():
+            # Renaming the index renames its constraint too.
+            await self.session.execute(
+                text(f"ALTER INDEX {staging_name} RENAME TO {name}")
+            )
+
+    async def _copy_data(
+        self, df: DataFrame, table_name: str = HS_TABLE.name
+    ) -> int:
+        return await self._copy_frame(self.validator.validate(df), table_name)
+
+    async def _copy_frame(self, df: DataFrame, table_name: str) -> int:
+        # Records are zipped from columns, without per-row dicts.
+        records = list(zip(*(df[column].tolist() for column in HS_COLUMNS)))
+        await self._copy_records(records, table_name)
+        return len(records)
+
+    async def _copy_records(
+        self,
+        records: list[tuple[Any, ...]],
+        table_name: str,
     ) -> None:
+        """
+        Binary COPY of records by batches in the session transaction.
+        """
+        driver_connection = await self._get_driver_connection()
+        batch_rows = settings.HS_COPY_BATCH_ROWS
+        for start in range(0, len(records), batch_rows):
+            await driver_connection.copy_records_to_table(
+                table_name,
+                records=records[start : start + batch_rows],
+                columns=HS_COLUMNS,
+            )
+
+    async def _get_driver_connection(self) -> asyncpg.Connection:
+        connection = await self.session.connection()
+        # The asyncpg adapter begins the transaction lazily on the first
+        # statement, COPY on the driver connection must run inside it.
+        await connection.execute(text("SELECT 1"))
+        raw_connection = await connection.get_raw_connection()
+        return raw_connection.driver_connection
+
+    async def _handle_database_errors(
+        self, operation: Callable[[], Awaitable[T]]
+    ) -> T:
         exception_handlers: dict[Type[Exception], tuple[HTTPStatus, str]] = {
             IntegrityError: (
                 HTTPStatus.CONFLICT,
@@ -127,12 +838,32 @@ class ProductHSRepository(AbstractProductHSRepository):
                 HTTPStatus.INTERNAL_SERVER_ERROR,
                 "Неизвестная ошибка базы данных",
             ),
+            # Raised by COPY on the driver connection.
+            asyncpg.IntegrityConstraintViolationError: (
+                HTTPStatus.CONFLICT,
+                "Конфликт данных (дубликаты, внешние ключи)",
+            ),
+            asyncpg.DataError: (
+                HTTPStatus.BAD_REQUEST,
+                "Некорректный формат данных",
+            ),
+            asyncpg.PostgresError: (
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                "Неизвестная ошибка базы данных",
+            ),
         }
         exceptions = tuple(exception_handlers.keys())
         try:
-            await operation()
+            return await operation()
+        except HTTPException:
+            await self.session.rollback()
+            raise
         except exceptions as error:
-            status_code, message = exception_handlers[type(error)]
+            status_code, message = next(
+                handler
+                for exception, handler in exception_handlers.items()
+                if isinstance(error, exception)
+            )
             await self.session.rollback()
             logger.error(f"Error: {str(error)}")
             raise HTTPException(status_code, message)
@@ -157,38 +888,402 @@ class ProductHSService:
         "Дата ввода в оборот": "data_in",
     }
 
-    def __init__(self, repository: AbstractProductHSRepository):
+    def __init__(
+        self,
+        repository: AbstractProductHSRepository,
+        summary: SummaryService | None = None,
+        cache: TTLCache[CheckCacheKey, list[ProductCheck]] | None = None,
+        snapshots: SnapshotService | None = None,
+    ):
         self.repository = repository
+        self.summary = summary
+        self.cache = cache
+        self.snapshots = snapshots
         self.file_handler = FileHandler()
 
     async def load_data(self, df: DataFrame) -> None:
         await self.repository.load_data(df)
+        await self._data_changed(SOURCE_HS_LOAD)
 
     async def clear(self) -> None:
         await self.repository.clear()
+        if self.snapshots is not None:
+            await self.snapshots.clear()
+        await self._data_changed(SOURCE_HS_CLEAR)
 
-    async def check(self, key: str) -> IncorrectData:
-        res = await self.repository.get_incorrect(key)
+    async def check(self, key: str) -> list[ProductCheck]:
+        """
+        Результат сверки кэшируется до изменения данных: ключ кэша
+        включает версии выгрузки ЧЗ и товаров, взятые до запроса.
+        В кэше строки результата, а не объекты ORM.
+        """
+        cache_key = (key, hs_version.value, products_version.value)
+        if self.cache is not None:
+            is_cached, cached = self.cache.get(cache_key)
+            if is_cached and cached is not None:
+                return cached
+        rows = await self.repository.get_incorrect(key)
+        res = [to_product_check(pr, pr2) for pr, pr2 in rows]
+        if self.cache is not None:
+            self.cache.set(cache_key, res)
         return res
 
-    async def get_csv_from_zip(self, file_hs: UploadFile) -> bytes:
+    async def apply_check(
+        self, key: str, status: StatusEnum | None, dry_run: bool
+    ) -> CheckApplyResult:
+        """
+        Установка статуса всем товарам результата сверки одним UPDATE.
+        В режиме dry_run только подсчёт затрагиваемых товаров.
+        """
+        if status is None:
+            if key not in APPLY_STATUSES:
+                raise HTTPException(
+                    HTTPStatus.BAD_REQUEST, "Status is required for the key"
+                )
+            status = APPLY_STATUSES[key]
+        affected = await self.repository.apply_check(key, status, dry_run)
+        if not dry_run and affected:
+            product_cache.clear()
+            products_version.bump()
+            await self._refresh_summary(SOURCE_PRODUCTS)
+        return CheckApplyResult(
+            key=key, status=status, affected=affected, dry_run=dry_run
+        )
+
+    async def check_all(self) -> ProductCheckAll:
+        """
+        Сверка по всем ключам за один проход FULL JOIN.
+        """
+        rows = await self.repository.get_incorrect_all()
+        items: dict[str, list[ProductCheck]] = {key: [] for key in CHECK_KEYS}
+        for pr, pr2, key in rows:
+            items[key].append(to_product_check(pr, pr2))
+        return ProductCheckAll(
+            counts={key: len(checks) for key, checks in items.items()},
+            items=items,
+        )
+
+    async def check_page(
+        self, key: str, limit: int, after: str | None, with_total: bool
+    ) -> ProductCheckPage:
+        # One extra row shows whether the next page exists.
+        rows = await self.repository.get_incorrect_page(key, limit + 1, after)
+        page = [to_product_check(pr, pr2) for pr, pr2 in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            pr, pr2 = rows[limit - 1]
+            next_cursor = (pr or pr2).code_mark_head
+        total = (
+            await self.repository.count_incorrect(key) if with_total else None
+        )
+        return ProductCheckPage(
+            items=page, next_cursor=next_cursor, total=total
+        )
+
+    def export_check_csv(self, key: str) -> AsyncIterator[bytes]:
+        """
+        CSV сверки по частям, для Excel: UTF-8 с BOM и разделитель ";".
+        """
+        get_stmt(key)  # Неверный ключ отклоняется до начала ответа
+        return self._iter_check_csv(key)
+
+    async def load_zip(
+        self, file_hs: UploadFile, diff: bool = False
+    ) -> HSLoadResult:
+        """
+        Загрузка архива из памяти, все CSV файлы архива одной загрузкой.
+        """
         await self.file_handler.validate_zip(file_hs)
         content_hs = await self.file_handler.read_file(file_hs)
-        return await self.file_handler.extract_csv(content_hs)
+        loop = asyncio.get_running_loop()
+        sha256 = await loop.run_in_executor(
+            None, lambda: hashlib.sha256(content_hs).hexdigest()
+        )
+        result = await self._load_archive(
+            content_hs, sha256, JOB_LOAD, {}, diff=diff
+        )
+        return HSLoadResult(**result)
+
+    async def load_zip_stream(
+        self, file_hs: UploadFile, diff: bool = False
+    ) -> HSLoadResult:
+        """
+        Загрузка архива потоком: файл на диске, CSV по частям.
+        """
+        async with self.file_handler.spooled(file_hs) as (path, sha256):
+            result = await self._load_archive(
+                path, sha256, JOB_LOAD, {}, diff=diff
+            )
+        return HSLoadResult(**result)
 
-    async def process_csv(self, content_hs: bytes) -> pd.DataFrame:
-        """Обработка CSV с переименованием колонок"""
-        # Чтение CSV через отдельный поток (pandas блокирующий)
+    async def accept_zip(self, file_hs: UploadFile) -> HSAcceptResult:
+        """
+        Частичная загрузка: корректные строки фиксируются по частям,
+        некорректные и повторные коды попадают в отчёт отклонённых строк.
+        """
+        async with self.file_handler.spooled(file_hs) as (path, sha256):
+            result = await self._load_archive(path, sha256, JOB_ACCEPT, {})
+        return HSAcceptResult(**result)
+
+    async def sync_zip(
+        self, file_hs: UploadFile, force: bool = False
+    ) -> HSSyncResult:
+        """
+        Синхронизация таблицы с выгрузкой: новые коды добавляются,
+        изменённые обновляются, отсутствующие в выгрузке удаляются.
+        Удаление большой доли кодов выполняется только с force.
+        """
+        async with self.file_handler.spooled(file_hs) as (path, sha256):
+            result = await self._load_archive(
+                path, sha256, JOB_SYNC, {}, force=force
+            )
+        return HSSyncResult(**result)
+
+    async def reload_zip(self, file_hs: UploadFile) -> HSLoadResult:
+        """
+        Полная замена данных через промежуточную таблицу: читатели видят
+        либо старую, либо новую выгрузку целиком.
+        """
+        async with self.file_handler.spooled(file_hs) as (path, sha256):
+            result = await self._load_archive(path, sha256, JOB_RELOAD, {})
+        return HSLoadResult(**result)
+
+    async def start_job(
+        self,
+        file_hs: UploadFile,
+        mode: str,
+        diff: bool = False,
+        force: bool = False,
+    ) -> HSJob:
+        """
+        Фоновая загрузка: архив сохраняется на диск в запросе, разбор
+        и запись идут в фоновой задаче со своей сессией.
+        """
+        if mode not in JOB_MODES:
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "Not valid mode")
+        await self.file_handler.validate_zip(file_hs)
+        path, sha256 = await self.file_handler.spool_file(file_hs)
+        job = job_registry.create(mode)
+        job_registry.start(
+            job, lambda: run_hs_job(job, path, sha256, diff, force)
+        )
+        return job
+
+    async def run_job(
+        self,
+        job: HSJob,
+        path: str,
+        sha256: str,
+        diff: bool = False,
+        force: bool = False,
+    ) -> None:
+        result = await self._load_archive(
+            path, sha256, job.mode, job.files, job, diff, force
+        )
+        result.pop("files")
+        job.result = result
+
+    async def _load_archive(
+        self,
+        archive: str | bytes,
+        sha256: str,
+        mode: str,
+        files: dict[str, int],
+        job: HSJob | None = None,
+        diff: bool = False,
+        force: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Загрузка архива в режиме mode. Повторная загрузка того же файла
+        в том же режиме возвращает сохранённый результат без разбора,
+        одновременные загрузки одного файла ждут друг друга.
+        С diff близкий файл (следующая выгрузка из тех же CSV файлов)
+        в режиме загрузки проходит через синхронизацию.
+        С force синхронизация может удалить любую долю кодов.
+        """
+        set_stage(JOB_PARSING)
+        members = await self.file_handler.read_members(archive)
+        if self.snapshots is None:
+            return await self._apply_archive(
+                archive, mode, files, job, force=force
+            )
+        async with self.snapshots.lock(sha256):
+            previous, near = await self.snapshots.find(sha256, mode, members)
+            if previous is not None:
+                logger.info(f"Upload {sha256} is already loaded")
+                files.update(previous.result.get("files", {}))
+                return {**previous.result, "duplicate": True}
+            dumped = await self._apply_archive(
+                archive, mode, files, job, diff and near, force
+            )
+            await self.snapshots.record(sha256, mode, members, dumped)
+        return dumped
+
+    async def _apply_archive(
+        self,
+        archive: str | bytes,
+        mode: str,
+        files: dict[str, int],
+        job: HSJob | None,
+        near: bool = False,
+        force: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Разбор архива и запись в режиме mode, близкий файл в режиме
+        загрузки синхронизируется: меняются только различия.
+        """
+        frames = self._iter_parsed_frames(archive, files)
+        if job is not None:
+            frames = track_rows(job, frames)
+        if mode == JOB_LOAD and near:
+            synced = await self.repository.sync_frames(frames, force)
+            result = HSLoadResult(processed=synced.processed, synced=synced)
+            source = SOURCE_HS_SYNC
+        elif mode == JOB_LOAD:
+            processed = await self.repository.load_frames(frames)
+            result = HSLoadResult(processed=processed)
+            source = SOURCE_HS_LOAD
+        elif mode == JOB_SYNC:
+            result = await self.repository.sync_frames(frames, force)
+            source = SOURCE_HS_SYNC
+        elif mode == JOB_ACCEPT:
+            report = RejectReport()
+            accepted = await self.repository.accept_frames(frames, report)
+            result = HSAcceptResult(
+                processed=accepted + report.rows,
+                accepted=accepted,
+                rejected=report.rows,
+                errors=report.errors(),
+                report_id=report.id if report.rows else None,
+            )
+            source = SOURCE_HS_LOAD
+        else:
+            processed = await self.repository.reload_frames(frames)
+            result = HSLoadResult(processed=processed)
+            source = SOURCE_HS_RELOAD
+        await self._data_changed(source)
+        result.files = files
+        return result.model_dump(mode="json")  # type: ignore[no-any-return]
+
+    async def _data_changed(self, source: str) -> None:
+        hs_version.bump()
+        set_stage(JOB_SUMMARIZING)
+        await self._refresh_summary(source)
+
+    async def _refresh_summary(self, source: str) -> None:
+        if self.summary is not None:
+            await self.summary.refresh(source)
+
+    async def _iter_parsed_frames(
+        self, archive: str | bytes, files: dict[str, int]
+    ) -> AsyncIterator[DataFrame]:
+        blocks = self.file_handler.iter_csv_blocks(
+            archive, settings.HS_PARSE_BLOCK_BYTES
+        )
+        async for frame in self._parse_blocks(blocks, files):
+            yield frame
+
+    async def _parse_blocks(
+        self, blocks: AsyncIterator[tuple[str, bytes]], files: dict[str, int]
+    ) -> AsyncIterator[DataFrame]:
+        """
+        Разбор блоков строк CSV и дат в пуле процессов, результат
+        возвращается по колонкам (строки Arrow). Строка фильтра файла
+        убирается, заголовок файла добавляется к его остальным блокам.
+        Блоки нескольких файлов архива разбираются вперемешку, пул занят
+        и на границе файлов; в files - число строк по файлам.
+        Блоки не режут значения в кавычках с переводом строки.
+        """
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        block_params = self._block_params()
+        date_columns = [
+            column_csv
+            for column_csv, column in self.COLUMN_MAPPING.items()
+            if column == HS_DATE_COLUMN
+        ]
+        member: str | None = None
+        header = b""
+        rows = 0
+        pending: deque[tuple[str, asyncio.Future[DataFrame]]] = deque()
+        try:
+            async for name, block in blocks:
+                if name != member:  # Первый блок файла
+                    member = name
+                    block = block.partition(b"\n")[2]  # Строка фильтра
+                    if not block:
+                        raise HTTPException(
+                            HTTPStatus.BAD_REQUEST,
+                            f"Нет заголовка CSV: {member}",
+                        )
+                    header = block.partition(b"\n")[0] + b"\n"
+                    files[member] = 0
+                else:
+                    block = header + block
+                pending.append(
+                    (
+                        member,
+                        loop.run_in_executor(
+                            pool,
+                            parse_csv_block,
+                            block,
+                            block_params,
+                            date_columns,
+                        ),
+                    )
+                )
+                if len(pending) < settings.HS_PARSE_WORKERS:
+                    continue
+                name, future = pending.popleft()
+                frame = await future
+                # Номера строк сквозные по загрузке, как при разборе по частям
+                frame.index = pd.RangeIndex(rows, rows + len(frame))
+                rows += len(frame)
+                files[name] += len(frame)
+                yield self._prepare_frame(frame)
+            while pending:
+                name, future = pending.popleft()
+                frame = await future
+                frame.index = pd.RangeIndex(rows, rows + len(frame))
+                rows += len(frame)
+                files[name] += len(frame)
+                yield self._prepare_frame(frame)
+        except HTTPException:
+            raise
+        except Exception as error:
+            raise HTTPException(
+                HTTPStatus.INTERNAL_SERVER_ERROR, f"Ошибка: {str(error)}"
+            )
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    async def _iter_check_csv(self, key: str) -> AsyncIterator[bytes]:
+        columns = list(ProductCheck.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8-sig")
+        async for rows in self.repository.stream_incorrect(key):
+            buffer.seek(0)
+            buffer.truncate()
+            for pr, pr2 in rows:
+                check = to_product_check(pr, pr2)
+                writer.writerow(
+                    [getattr(check, column) or "" for column in columns]
+                )
+            yield buffer.getvalue().encode("utf-8")
+
+    def _csv_params(self) -> dict[str, Any]:
         csv_params: dict[str, Any] = {
             "index_col": False,  # Явно отключаем индекс
             "skiprows": 1,  # Пропускаем строку фильтра и заголовок
             "header": 0,  # Используем следующую строку как заголовок
             "usecols": list(self.COLUMN_MAPPING.keys()),
-            "on_bad_lines": "skip",  # Пропускаем битые строки
-            "dtype": {
-                "GTIN": str,  # Явно указываем тип как строка
-                "Код ТН ВЭД": str,
-                "Производитель / Импортер": str,
+            "dtype": {  # Все колонки, кроме даты, читаем как строки
+                column_csv: str
+                for column_csv, column in self.COLUMN_MAPPING.items()
+                if column != HS_DATE_COLUMN
             },
             #  "parse_dates": ["Дата ввода в оборот"], # Автоматический парсинг
             #  "date_parser": lambda x: datetime.strptime(
@@ -196,25 +1291,57 @@ class ProductHSService:
             #  ),
             "keep_default_na": False,  # Отключить автомат преобразование в NaN
         }
-        loop = asyncio.get_event_loop()
-        df: DataFrame = await loop.run_in_executor(
-            None, lambda: pd.read_csv(io.BytesIO(content_hs), **csv_params)
-        )
-        df = df.rename(columns=self.COLUMN_MAPPING)
+        return csv_params
 
-        # Ручное преобразование, если автоматическое не работает
-        df["data_in"] = pd.to_datetime(
-            df["data_in"],
-            format="ISO8601",  # Альтернативный вариант для ISO-формата
-            utc=True,
-        )
+    def _block_params(self) -> dict[str, Any]:
+        """
+        Параметры разбора блоков: блок начинается с заголовка,
+        все колонки читаются строками Arrow, даты приводятся в процессе.
+        Строки с неверным числом полей отмечает parse_csv_block.
+        """
+        block_params = {
+            **self._csv_params(),
+            "skiprows": 0,
+            "engine": settings.HS_CSV_ENGINE,
+            "dtype": {
+                column_csv: "string[pyarrow]"
+                for column_csv in self.COLUMN_MAPPING
+            },
+        }
+        if settings.HS_CSV_ENGINE == "pyarrow":
+            del block_params["index_col"]  # Не поддерживается pyarrow
+        return block_params
 
-        return df
+    def _prepare_frame(self, df: DataFrame) -> DataFrame:
+        # Даты приводятся при валидации (HSFrameValidator)
+        return df.rename(columns=self.COLUMN_MAPPING)
 
 
-@lru_cache()
 def get_product_hs_service(
     session: AsyncSession = Depends(get_session),
 ) -> ProductHSService:
     repository = ProductHSRepository(session)
-    return ProductHSService(repository)
+    return ProductHSService(
+        repository,
+        SummaryService(SummaryRepository(session)),
+        check_cache,
+        SnapshotService(SnapshotRepository(session)),
+    )
+
+
+async def run_hs_job(
+    job: HSJob,
+    path: str,
+    sha256: str,
+    diff: bool = False,
+    force: bool = False,
+) -> None:
+    """
+    Background job with its own session, the request one is closed.
+    """
+    try:
+        async with async_session() as session:
+            service = get_product_hs_service(session)
+            await service.run_job(job, path, sha256, diff, force)
+    finally:
+        os.remove(path)
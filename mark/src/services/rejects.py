@@ -0,0 +1,84 @@
+import asyncio
+import os
+from collections import Counter
+from uuid import uuid4
+
+from pandas import DataFrame
+
+from api.v1.api_models.products_hs import HSRowError
+from core.settings import settings
+from services.validation import HS_COLUMNS
+
+REJECTS_DIR = os.path.join(settings.BASE_DIR, "rejects")
+REJECT_COLUMNS: list[str] = ["row", "column", "reason", *HS_COLUMNS]
+
+
+def get_report_path(report_id: str) -> str | None:
+    """
+    Path of the stored report, None for unknown or foreign ids.
+    """
+    if len(report_id) != 32 or not report_id.isalnum():
+        return None
+    path = os.path.join(REJECTS_DIR, f"{report_id}.csv")
+    return path if os.path.exists(path) else None
+
+
+def prune_reports(keep: int) -> None:
+    """
+    Only the latest reports are kept.
+    """
+    paths = sorted(
+        (entry.path for entry in os.scandir(REJECTS_DIR)),
+        key=os.path.getmtime,
+    )
+    for path in paths[: max(len(paths) - keep, 0)]:
+        os.remove(path)
+
+
+class RejectReport:
+    """
+    Rows rejected by the partial load, written to CSV as they come.
+    Row numbers are numbers of data rows in the upload (from 1).
+    """
+
+    def __init__(self, max_reported_rows: int = settings.HS_MAX_REPORTED_ROWS):
+        self.id = uuid4().hex
+        self.path = os.path.join(REJECTS_DIR, f"{self.id}.csv")
+        self.max_reported_rows = max_reported_rows
+        self.rows = 0
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self.reported: dict[tuple[str, str], list[int]] = {}
+
+    async def add(self, rejected: DataFrame, column: str, reason: str) -> None:
+        """
+        Adds rows with one reason, the frame has HS columns.
+        """
+        if rejected.empty:
+            return
+        report = rejected.assign(
+            row=rejected.index + 1, column=column, reason=reason
+        )[REJECT_COLUMNS]
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, report)
+        self.rows += len(report)
+        self.counts[(column, reason)] += len(report)
+        reported = self.reported.setdefault((column, reason), [])
+        free = self.max_reported_rows - len(reported)
+        reported.extend(int(row) for row in report["row"][:free])
+
+    def errors(self) -> list[HSRowError]:
+        return [
+            HSRowError(
+                column=column,
+                reason=reason,
+                count=count,
+                rows=self.reported[(column, reason)],
+            )
+            for (column, reason), count in self.counts.items()
+        ]
+
+    def _write(self, report: DataFrame) -> None:
+        if not self.rows:
+            os.makedirs(REJECTS_DIR, exist_ok=True)
+            prune_reports(settings.HS_REJECTS_KEEP - 1)
+        report.to_csv(self.path, mode="a", header=not self.rows, index=False)
@@ -0,0 +1,137 @@
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.logger import logger
+from core.settings import settings
+from db.postgres import engine
+from models.entity import HSSnapshot
+
+
+class AbstractSnapshotRepository(ABC):
+
+    @abstractmethod
+    async def get_latest(self) -> HSSnapshot | None:
+        """
+        Method for getting the snapshot of the latest load.
+        """
+        ...
+
+    @abstractmethod
+    async def add(self, snapshot: HSSnapshot) -> HSSnapshot:
+        """
+        Method for saving the snapshot.
+        """
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """
+        Method for deleting all snapshots.
+        """
+        ...
+
+    @abstractmethod
+    def lock(self, sha256: str) -> AsyncContextManager[None]:
+        """
+        Method for holding the lock of uploads of the file.
+        """
+        ...
+
+
+class SnapshotRepository(AbstractSnapshotRepository):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_latest(self) -> HSSnapshot | None:
+        result = await self.session.execute(
+            select(HSSnapshot).order_by(HSSnapshot.created_at.desc()).limit(1)
+        )
+        return result.scalars().first()  # type: ignore[no-any-return]
+
+    async def add(self, snapshot: HSSnapshot) -> HSSnapshot:
+        self.session.add(snapshot)
+        await self.session.commit()
+        return snapshot
+
+    async def clear(self) -> None:
+        await self.session.execute(delete(HSSnapshot))
+        await self.session.commit()
+
+    @asynccontextmanager
+    async def lock(self, sha256: str) -> AsyncIterator[None]:
+        """
+        Session advisory lock on its own connection: the load commits
+        in between, the lock is held until its snapshot is recorded.
+        """
+        params = {"lock_name": f"hs_upload:{sha256}"}
+        async with engine.connect() as connection:
+            await connection.execute(
+                text("SELECT pg_advisory_lock(hashtext(:lock_name))"), params
+            )
+            try:
+                yield
+            finally:
+                await connection.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:lock_name))"),
+                    params,
+                )
+
+
+class SnapshotService:
+    """
+    Loaded HS archives, for skipping of repeated uploads.
+    Only the latest snapshot matters: it is what the table holds.
+    """
+
+    def __init__(
+        self,
+        repository: AbstractSnapshotRepository,
+        near_share: float = settings.HS_SNAPSHOT_NEAR_SHARE,
+    ):
+        self.repository = repository
+        self.near_share = near_share
+
+    def lock(self, sha256: str) -> AsyncContextManager[None]:
+        """
+        Uploads of the same file wait for each other: the second one
+        finds the snapshot of the first instead of loading it again.
+        """
+        return self.repository.lock(sha256)
+
+    async def find(
+        self, sha256: str, mode: str, members: dict[str, int]
+    ) -> tuple[HSSnapshot | None, bool]:
+        """
+        Снимок последней загрузки, если загружен тот же файл в том же
+        режиме, и признак близкого файла: те же CSV файлы архива, что
+        и в последней загрузке, и доля файлов с той же CRC-32 не меньше
+        near_share (следующая выгрузка с частью неизменных файлов).
+        """
+        latest = await self.repository.get_latest()
+        if latest is None:
+            return None, False
+        if latest.sha256 == sha256 and latest.mode == mode:
+            return latest, False
+        if set(latest.members) != set(members):
+            return None, False
+        unchanged = sum(
+            latest.members[member] == crc for member, crc in members.items()
+        )
+        return None, unchanged >= self.near_share * len(members)
+
+    async def record(
+        self,
+        sha256: str,
+        mode: str,
+        members: dict[str, int],
+        result: dict[str, Any],
+    ) -> None:
+        await self.repository.add(HSSnapshot(sha256, mode, members, result))
+        logger.info(f"Snapshot {mode}: {sha256}")
+
+    async def clear(self) -> None:
+        await self.repository.clear()
@@ -0,0 +1,181 @@
+import asyncio
+from abc import ABC, abstractmethod
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Sequence
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.logger import logger
+from core.settings import settings
+from db.postgres import async_session, get_session
+from models.entity import CheckSummary, Product, StatusEnum
+from services.help import CHECK_KEYS, get_full_stmt
+
+SOURCE_HS_LOAD = "hs_load"
+SOURCE_HS_SYNC = "hs_sync"
+SOURCE_HS_RELOAD = "hs_reload"
+SOURCE_HS_CLEAR = "hs_clear"
+SOURCE_PRODUCTS = "products"
+SOURCE_REQUEST = "request"
+
+
+class AbstractSummaryRepository(ABC):
+
+    @abstractmethod
+    async def compute(self) -> tuple[dict[str, int], dict[str, int]]:
+        """
+        Method for counting check results by key and products by status.
+        """
+        ...
+
+    @abstractmethod
+    async def add(self, summary: CheckSummary) -> CheckSummary:
+        """
+        Method for saving the summary.
+        """
+        ...
+
+    @abstractmethod
+    async def get_history(self, limit: int) -> Sequence[CheckSummary]:
+        """
+        Method for getting the latest summaries, newest first.
+        """
+        ...
+
+
+class SummaryRepository(AbstractSummaryRepository):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def compute(self) -> tuple[dict[str, int], dict[str, int]]:
+        full = get_full_stmt().subquery()
+        counts = dict.fromkeys(CHECK_KEYS, 0)
+        statuses = {status.name: 0 for status in StatusEnum}
+        try:
+            by_key = await self.session.execute(
+                select(full.c.discrepancy, func.count()).group_by(
+                    full.c.discrepancy
+                )
+            )
+            by_status = await self.session.execute(
+                select(Product.status, func.count()).group_by(Product.status)
+            )
+        except SQLAlchemyError as error:
+            await self.session.rollback()
+            raise HTTPException(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                f"Ошибка базы данных: {str(error)}",
+            )
+        counts.update({key: count for key, count in by_key.tuples()})
+        statuses.update(
+            {
+                StatusEnum(status).name: count
+                for status, count in by_status.tuples()
+            }
+        )
+        return counts, statuses
+
+    async def add(self, summary: CheckSummary) -> CheckSummary:
+        self.session.add(summary)
+        await self.session.commit()
+        await self.session.refresh(summary)
+        return summary
+
+    async def get_history(self, limit: int) -> Sequence[CheckSummary]:
+        result = await self.session.execute(
+            select(CheckSummary)
+            .order_by(CheckSummary.created_at.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()  # type: ignore[no-any-return]
+
+
+class SummaryService:
+    """
+    Precomputed reconciliation summary, refreshed after data loads.
+    """
+
+    def __init__(self, repository: AbstractSummaryRepository):
+        self.repository = repository
+
+    async def refresh(self, source: str) -> CheckSummary | None:
+        """
+        Новый снимок сводки. Ошибка не отменяет уже сохранённую загрузку:
+        она пишется в лог, а сводка остаётся прежней.
+        """
+        try:
+            counts, statuses = await self.repository.compute()
+            summary = await self.repository.add(
+                CheckSummary(source, counts, statuses)
+            )
+        except (HTTPException, SQLAlchemyError) as error:
+            logger.error(f"Summary refresh failed after {source}: {error}")
+            return None
+        logger.info(f"Summary after {source}: {counts}")
+        return summary
+
+    async def get_latest(self) -> CheckSummary | None:
+        history = await self.repository.get_history(1)
+        if history:
+            return history[0]
+        return await self.refresh(SOURCE_REQUEST)
+
+    async def get_history(self, limit: int) -> Sequence[CheckSummary]:
+        return await self.repository.get_history(limit)
+
+
+async def refresh_summary(source: str) -> None:
+    """
+    Refresh with its own session, the request one may be closed.
+    """
+    async with async_session() as session:
+        await SummaryService(SummaryRepository(session)).refresh(source)
+
+
+class SummaryRefresher:
+    """
+    Summary refreshes off the request path. Requests during the delay
+    or a running refresh are coalesced into one refresh after it:
+    a burst of small writes costs one or two computations, not one each.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str], Awaitable[Any]] = refresh_summary,
+        delay: float = settings.CHECK_SUMMARY_REFRESH_DELAY,
+    ):
+        self.refresh = refresh
+        self.delay = delay
+        self.pending: str | None = None
+        self.task: asyncio.Task[None] | None = None
+
+    def schedule(self, source: str) -> None:
+        self.pending = source
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while self.pending is not None:
+            await asyncio.sleep(self.delay)
+            source, self.pending = self.pending, None
+            try:
+                await self.refresh(source)
+            except Exception as error:
+                logger.error(f"Summary refresh failed after {source}: {error}")
+
+
+summary_refresher = SummaryRefresher()
+
+
+def get_summary_service(
+    session: AsyncSession = Depends(get_session),
+) -> SummaryService:
+    return SummaryService(SummaryRepository(session))
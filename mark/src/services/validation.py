@@ -0,0 +1,164 @@
+from http import HTTPStatus
+
+import pandas as pd
+from fastapi import HTTPException
+from pandas import DataFrame, Series
+
+from api.v1.api_models.products_hs import HSRowError
+from core.logger import logger
+from core.settings import settings
+from services.parsing import MALFORMED_COLUMN
+
+HS_STRING_COLUMNS: tuple[str, ...] = (
+    "code_mark_head",
+    "code_hs",
+    "code_customs",
+    "inn_supplier",
+    "name",
+    "brand",
+    "name_supplier",
+)
+HS_DATE_COLUMN = "data_in"
+HS_COLUMNS: list[str] = [*HS_STRING_COLUMNS, HS_DATE_COLUMN]
+HS_REQUIRED_COLUMNS: tuple[str, ...] = ("code_mark_head",)
+
+REASON_MISSING = "missing"
+REASON_NOT_STRING = "not_string"
+REASON_EMPTY = "empty"
+REASON_TOO_LONG = "too_long"
+REASON_NOT_DATE = "not_date"
+REASON_DUPLICATE = "duplicate"
+REASON_MALFORMED = "malformed"
+
+ErrorMasks = dict[tuple[str, str], Series]
+ErrorFrames = dict[tuple[str, str], DataFrame]
+
+
+class HSFrameValidator:
+    """
+    Column-wise validation of HS data without building per-row objects.
+    Row numbers in errors are numbers of data rows in the file (from 1).
+    """
+
+    def __init__(
+        self,
+        max_length: int = settings.HS_MAX_STRING_LENGTH,
+        max_reported_rows: int = settings.HS_MAX_REPORTED_ROWS,
+    ):
+        self.max_length = max_length
+        self.max_reported_rows = max_reported_rows
+
+    def validate(self, df: DataFrame) -> DataFrame:
+        """
+        Returns the frame with HS columns and coerced dates
+        or raises HTTPException with offending columns and rows.
+        Malformed lines are skipped, only the partial load reports them.
+        """
+        self._check_columns(df)
+        if MALFORMED_COLUMN in df:
+            df = df[~df[MALFORMED_COLUMN]]
+        df, masks = self.inspect(df)
+        errors = self.report(masks)
+        if errors:
+            self._raise(errors)
+        return df
+
+    def split(self, df: DataFrame) -> tuple[DataFrame, ErrorFrames]:
+        """
+        Returns valid rows with coerced dates (the first row of the
+        duplicated codes) and invalid rows as they are, by the first
+        (column, reason) of the row. Lines with a wrong number of fields
+        are rejected as malformed. Missing columns raise HTTPException.
+        """
+        self._check_columns(df)
+        coerced, masks = self.inspect(df)
+        invalid = Series(False, index=df.index)
+        rejected: ErrorFrames = {}
+        if MALFORMED_COLUMN in df:
+            invalid = df[MALFORMED_COLUMN].astype(bool)
+            rejected[("", REASON_MALFORMED)] = df.loc[invalid, HS_COLUMNS]
+        for key, mask in masks.items():
+            mask = mask & ~invalid
+            rejected[key] = df.loc[mask, HS_COLUMNS]
+            invalid |= mask
+        codes = coerced.loc[~invalid, HS_REQUIRED_COLUMNS[0]]
+        duplicate = codes.duplicated().reindex(df.index, fill_value=False)
+        rejected[(HS_REQUIRED_COLUMNS[0], REASON_DUPLICATE)] = df.loc[
+            duplicate, HS_COLUMNS
+        ]
+        invalid |= duplicate
+        return coerced[~invalid], {
+            key: frame for key, frame in rejected.items() if not frame.empty
+        }
+
+    def inspect(self, df: DataFrame) -> tuple[DataFrame, ErrorMasks]:
+        """
+        Coerces HS columns and collects masks of invalid rows
+        by (column, reason).
+        """
+        df = df[HS_COLUMNS].copy()
+        masks: ErrorMasks = {}
+        for column in HS_STRING_COLUMNS:
+            masks.update(self._check_string(df[column], column))
+        dates = df[HS_DATE_COLUMN]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(
+                dates, format="ISO8601", utc=True, errors="coerce"
+            )
+            df[HS_DATE_COLUMN] = dates
+        masks[(HS_DATE_COLUMN, REASON_NOT_DATE)] = dates.isna()
+        return df, {key: mask for key, mask in masks.items() if mask.any()}
+
+    def report(self, masks: ErrorMasks) -> list[HSRowError]:
+        errors = []
+        for (column, reason), mask in masks.items():
+            rows = mask.index[mask]
+            errors.append(
+                HSRowError(
+                    column=column,
+                    reason=reason,
+                    count=len(rows),
+                    rows=[
+                        int(row) + 1 for row in rows[: self.max_reported_rows]
+                    ],
+                )
+            )
+        return errors
+
+    def _check_string(self, values: Series, column: str) -> ErrorMasks:
+        masks: ErrorMasks = {}
+        missing = Series(False, index=values.index)
+        if pd.api.types.is_string_dtype(values):
+            # <NA> of string dtypes is not a string; a missing key is empty.
+            is_string = values.notna()
+            if column in HS_REQUIRED_COLUMNS:
+                missing = ~is_string
+        else:
+            is_string = values.map(lambda value: isinstance(value, str))
+        masks[(column, REASON_NOT_STRING)] = ~is_string & ~missing
+        lengths = values.where(is_string, "").str.len()
+        if column in HS_REQUIRED_COLUMNS:
+            empty = values.where(is_string, "").str.strip().eq("")
+            masks[(column, REASON_EMPTY)] = (empty & is_string) | missing
+        masks[(column, REASON_TOO_LONG)] = lengths.gt(self.max_length)
+        return masks
+
+    def _check_columns(self, df: DataFrame) -> None:
+        missing = [column for column in HS_COLUMNS if column not in df]
+        if missing:
+            self._raise(
+                [
+                    HSRowError(column=column, reason=REASON_MISSING, count=0)
+                    for column in missing
+                ]
+            )
+
+    def _raise(self, errors: list[HSRowError]) -> None:
+        logger.error(f"Validation failed: {errors}")
+        raise HTTPException(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            {
+                "message": "Некорректные данные",
+                "errors": [error.model_dump() for error in errors],
+            },
+        )
@@ -5,7 +5,9 @@ import pytest
 from fastapi import FastAPI
 
 from api.v1.products import product_router
+from api.v1.products_hs import producths_router
 from services.products import ProductService, get_product_service
+from services.products_hs import ProductHSService, get_product_hs_service
 
 
 def get_test_app(mock_service: ProductService) -> FastAPI:
@@ -15,10 +17,29 @@ def get_test_app(mock_service: ProductService) -> FastAPI:
     return app
 
 
+def get_hs_test_app(mock_service: ProductHSService) -> FastAPI:
+    app = FastAPI()
+    app.dependency_overrides[get_product_hs_service] = lambda: mock_service
+    app.include_router(producths_router)
+    return app
+
+
 @pytest.fixture  # type: ignore[misc]
 def mock_product_service() -> Generator[MagicMock, Any, None]:
     mock = MagicMock(spec=ProductService)
     mock.get_product_by_qr = AsyncMock()
+    mock.get_products_by_qr = AsyncMock()
     mock.create_product = AsyncMock()
+    mock.create_products = AsyncMock()
     mock.update_product = AsyncMock()
+    mock.write_off = AsyncMock()
+    return mock
+
+
+@pytest.fixture  # type: ignore[misc]
+def mock_product_hs_service() -> Generator[MagicMock, Any, None]:
+    mock = MagicMock(spec=ProductHSService)
+    mock.load_zip_stream = AsyncMock()
+    mock.sync_zip = AsyncMock()
+    mock.apply_check = AsyncMock()
     return mock
@@ -0,0 +1,95 @@
+import uuid
+from datetime import date
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from admin.admin_models import ProductHSAdmin, search_columns
+from models.entity import Product, ProductHS
+
+
+def make_request(query_string: str) -> Request:
+    return Request({"type": "http", "query_string": query_string.encode()})
+
+
+def test_search_columns_without_cast() -> None:
+    # Arrange
+    stmt = select(Product.id)
+
+    # Act
+    compiled = search_columns(
+        stmt, [Product.name, Product.doc_in], "50%_off"
+    ).compile(dialect=postgresql.dialect())
+
+    # Assert
+    sql = str(compiled)
+    assert "CAST" not in sql
+    assert "products.name ILIKE" in sql
+    assert set(compiled.params.values()) == {"%50\\%\\_off%"}
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_keyset_list_estimated_count() -> None:
+    # Arrange
+    view = ProductHSAdmin()
+    product_hs = ProductHS("qr1", "", "name", "", date.today())
+    product_hs.id = uuid.UUID(int=1)
+    first_page = [product_hs]
+    estimated_count = view.exact_count_max_rows + 1
+    view._run_query = AsyncMock(
+        side_effect=[[estimated_count], first_page, [estimated_count], []]
+    )
+
+    # Act
+    page = await view.list(make_request("page=1&pageSize=1"))
+    await view.list(make_request("page=2&pageSize=1"))
+
+    # Assert
+    assert page.count == estimated_count
+    stmt = view._run_query.await_args_list[-1].args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(producthss.name, producthss.id) < (" in sql
+    assert "ORDER BY producthss.name DESC, producthss.id DESC" in sql
+    assert "OFFSET" not in sql
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_keyset_list_forgets_pages_after_change() -> None:
+    # Arrange
+    view = ProductHSAdmin()
+    product_hs = ProductHS("qr1", "", "name", "", date.today())
+    product_hs.id = uuid.UUID(int=1)
+    estimated_count = view.exact_count_max_rows + 1
+    view._run_query = AsyncMock(
+        side_effect=[[estimated_count], [product_hs], [estimated_count], []]
+    )
+    await view.list(make_request("page=1&pageSize=3"))
+
+    # Act
+    await view.after_model_delete(product_hs, make_request(""))
+    await view.list(make_request("page=2&pageSize=3"))
+
+    # Assert
+    stmt = view._run_query.await_args_list[-1].args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(producthss.name, producthss.id) <" not in sql
+    assert "OFFSET" in sql
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_keyset_list_ignores_not_sortable_column() -> None:
+    # Arrange
+    view = ProductHSAdmin()
+    estimated_count = view.exact_count_max_rows + 1
+    view._run_query = AsyncMock(side_effect=[[estimated_count], []])
+
+    # Act
+    await view.list(make_request("page=1&sortBy=code_customs&sort=asc"))
+
+    # Assert
+    stmt = view._run_query.await_args_list[-1].args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ORDER BY producthss.name DESC, producthss.id DESC" in sql
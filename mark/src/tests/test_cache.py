@@ -0,0 +1,145 @@
+import contextlib
+from http import HTTPStatus
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from api.v1.api_models.products import Product, ProductPutch
+from core.cache import DataVersion, TTLCache
+from services.products import (
+    AbstractProductRepository,
+    CachedProductRepository,
+)
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_ttl_and_negative_results() -> None:
+    # Arrange
+    timer = FakeTimer()
+    cache: TTLCache[str, str | None] = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("known_qr", "product")
+    cache.set("unknown_qr", None)
+
+    # Act & Assert
+    assert cache.get("known_qr") == (True, "product")
+    assert cache.get("unknown_qr") == (True, None)
+    timer.now = 6
+    assert cache.get("known_qr") == (False, None)
+    assert cache.stats() == {
+        "size": 1,
+        "maxsize": 10,
+        "weight": 1,
+        "hits": 2,
+        "misses": 1,
+    }
+
+
+def test_cache_lru_eviction_and_invalidation() -> None:
+    # Arrange
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("first", 1)
+    cache.set("second", 2)
+
+    # Act
+    cache.get("first")
+    cache.set("third", 3)
+    cache.invalidate("third")
+
+    # Assert
+    assert cache.get("second") == (False, None)
+    assert cache.get("third") == (False, None)
+    assert cache.get("first") == (True, 1)
+
+
+def test_cache_bounded_by_weight() -> None:
+    # Arrange
+    cache: TTLCache[str, list[int]] = TTLCache(maxsize=5, ttl=60, weigh=len)
+    cache.set("first", [1, 2])
+    cache.set("second", [1, 2])
+
+    # Act
+    cache.set("third", [1, 2])
+    cache.set("huge", [1] * 6)
+
+    # Assert
+    assert cache.get("first") == (False, None)
+    assert cache.get("huge") == (False, None)
+    assert cache.get("second") == (True, [1, 2])
+    assert cache.get("third") == (True, [1, 2])
+    assert cache.weight == 4
+
+
+WRITES: list[tuple[str, tuple[Any, ...]]] = [
+    (
+        "create_product",
+        (Product(name="name", code_mark_head="qr", doc_in="doc"),),
+    ),
+    (
+        "create_products",
+        ([Product(name="name", code_mark_head="qr", doc_in="doc")],),
+    ),
+    ("del_product_by_qr", ("qr",)),
+    ("update_product", ("qr", ProductPutch(name="name"))),
+    ("write_off", (["qr"], "doc_out", None)),
+    ("del_products", ()),
+]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+@pytest.mark.parametrize("method, args", WRITES)  # type: ignore[misc]
+@pytest.mark.parametrize("fails", [False, True])  # type: ignore[misc]
+async def test_cached_repository_invalidates_after_write(
+    method: str, args: tuple[Any, ...], fails: bool
+) -> None:
+    # Arrange
+    cache: TTLCache[str, Product | None] = TTLCache(maxsize=10, ttl=60)
+    cache.set("qr", None)
+    version = DataVersion()
+    cached_during_write: list[bool] = []
+
+    async def write(*_: Any) -> None:
+        cached_during_write.append(cache.get("qr")[0])
+        if fails:
+            raise HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR, "DB error")
+
+    repository = MagicMock(spec=AbstractProductRepository)
+    getattr(repository, method).side_effect = write
+    cached = CachedProductRepository(repository, cache, version)
+
+    # Act
+    with contextlib.suppress(HTTPException):
+        await getattr(cached, method)(*args)
+
+    # Assert
+    assert cached_during_write == [True]
+    assert cache.get("qr") == (False, None)
+    assert version.value == 1
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_cached_repository_skips_read_overlapping_write() -> None:
+    # Arrange
+    cache: TTLCache[str, Product | None] = TTLCache(maxsize=10, ttl=60)
+    version = DataVersion()
+    repository = MagicMock(spec=AbstractProductRepository)
+    cached = CachedProductRepository(repository, cache, version)
+
+    async def read(product_qr: str) -> None:
+        await cached.del_product_by_qr(product_qr)  # Write during the read
+
+    repository.get_product_by_qr.side_effect = read
+
+    # Act
+    await cached.get_product_by_qr("qr")
+
+    # Assert
+    assert cache.get("qr") == (False, None)
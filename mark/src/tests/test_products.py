@@ -1,3 +1,4 @@
+from datetime import date
 from http import HTTPStatus
 from typing import Any
 from unittest.mock import MagicMock
@@ -6,7 +7,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from api.v1.api_models.products import Product as ProductScheme
-from api.v1.api_models.products import ProductPutch
+from api.v1.api_models.products import ProductPutch, ProductWriteOffResult
 from models.entity import StatusEnum
 from tests.conftest import get_test_app
 
@@ -157,3 +158,141 @@ async def test_update_product_not_found(
 
     # Assert
     assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_lookup_products(mock_product_service: MagicMock) -> None:
+    # Arrange
+    found_product = ProductScheme(
+        code_mark_head="found_qr",
+        name="Found Product",
+        doc_in=DOC_IN_FIELD,
+        status=StatusEnum.ON_BALANCE,
+    )
+    mock_product_service.get_products_by_qr.return_value = (
+        [found_product],
+        ["unknown_qr"],
+    )
+
+    # Создаем тестовое приложение с моком
+    test_app = get_test_app(mock_product_service)
+    client = TestClient(test_app)
+
+    # Act
+    response = client.post(
+        "/lookup", json={"codes": ["found_qr", "unknown_qr"]}
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "found": [found_product.model_dump()],
+        "not_found": ["unknown_qr"],
+    }
+    mock_product_service.get_products_by_qr.assert_awaited_once_with(
+        ["found_qr", "unknown_qr"]
+    )
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_create_products(mock_product_service: MagicMock) -> None:
+    # Arrange
+    products = [
+        ProductScheme(code_mark_head=qr, name="Product", doc_in=DOC_IN_FIELD)
+        for qr in ("new_qr", "existing_qr")
+    ]
+    mock_product_service.create_products.return_value = (
+        ["new_qr"],
+        ["existing_qr"],
+    )
+
+    # Создаем тестовое приложение с моком
+    test_app = get_test_app(mock_product_service)
+    client = TestClient(test_app)
+
+    # Act
+    response = client.post(
+        "/batch",
+        json={"products": [product.model_dump() for product in products]},
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "created": ["new_qr"],
+        "existing": ["existing_qr"],
+    }
+    mock_product_service.create_products.assert_awaited_once_with(products)
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_write_off_products_csv(
+    mock_product_service: MagicMock,
+) -> None:
+    # Arrange
+    result = ProductWriteOffResult(
+        deducted=1, not_found=["unknown_qr"], already_deducted=[]
+    )
+    mock_product_service.write_off.return_value = result
+
+    # Создаем тестовое приложение с моком
+    test_app = get_test_app(mock_product_service)
+    client = TestClient(test_app)
+
+    # Act
+    response = client.post(
+        "/write-off/csv",
+        data={"doc_out": "doc_out", "data_out": "2025-04-02"},
+        files={"file_codes": ("codes.csv", b"qr1\r\n\r\nunknown_qr\r\n")},
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == result.model_dump()
+    mock_product_service.write_off.assert_awaited_once_with(
+        ["qr1", "unknown_qr"], "doc_out", date(2025, 4, 2)
+    )
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_write_off_products_csv_not_utf8(
+    mock_product_service: MagicMock,
+) -> None:
+    # Arrange
+    client = TestClient(get_test_app(mock_product_service))
+
+    # Act
+    response = client.post(
+        "/write-off/csv",
+        data={"doc_out": "doc_out"},
+        files={"file_codes": ("codes.csv", "qr1\r\nКИЗ\r\n".encode("cp1251"))},
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    mock_product_service.write_off.assert_not_awaited()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_write_off_products(mock_product_service: MagicMock) -> None:
+    # Arrange
+    result = ProductWriteOffResult(
+        deducted=1, not_found=[], already_deducted=["deducted_qr"]
+    )
+    mock_product_service.write_off.return_value = result
+    client = TestClient(get_test_app(mock_product_service))
+
+    # Act
+    response = client.post(
+        "/write-off",
+        json={"doc_out": "doc_out", "codes": ["qr1", "deducted_qr"]},
+    )
+    empty = client.post("/write-off", json={"doc_out": "doc_out", "codes": []})
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == result.model_dump()
+    mock_product_service.write_off.assert_awaited_once_with(
+        ["qr1", "deducted_qr"], "doc_out", None
+    )
+    assert empty.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
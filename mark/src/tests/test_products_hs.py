@@ -0,0 +1,1038 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+import zlib
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, AsyncIterator
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
+import pandas as pd
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from api.v1.api_models.products_hs import (
+    CheckApplyResult,
+    HSLoadResult,
+    HSSyncResult,
+    ProductCheck,
+)
+from core.cache import TTLCache
+from core.settings import settings
+from models.entity import HSSnapshot, ProductHS, StatusEnum
+from services import products_hs, rejects
+from services.help import FileHandler, read_blocks, read_csv_blocks
+from services.jobs import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_LOAD,
+    JOB_LOADING,
+    JOB_PARSING,
+    JOB_SUMMARIZING,
+    JobRegistry,
+)
+from services.parsing import (
+    get_process_pool,
+    parse_csv_block,
+    shutdown_process_pool,
+)
+from services.products import AbstractProductRepository, ProductService
+from services.products_hs import (
+    AbstractProductHSRepository,
+    ProductHSRepository,
+    ProductHSService,
+)
+from services.rejects import RejectReport, get_report_path
+from services.snapshots import AbstractSnapshotRepository, SnapshotService
+from services.summary import (
+    SOURCE_HS_CLEAR,
+    SOURCE_PRODUCTS,
+    AbstractSummaryRepository,
+    SummaryRefresher,
+    SummaryService,
+)
+from services.validation import (
+    HS_COLUMNS,
+    HS_STRING_COLUMNS,
+    REASON_MALFORMED,
+    HSFrameValidator,
+)
+from tests.conftest import get_hs_test_app
+
+CSV_HEADER = "Код,GTIN,Наименование товара"
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_upload_zip_stream(mock_product_hs_service: MagicMock) -> None:
+    # Arrange
+    mock_product_hs_service.load_zip_stream.return_value = HSLoadResult(
+        processed=3, files={"hs_1.csv": 2, "hs_2.csv": 1}
+    )
+    client = TestClient(get_hs_test_app(mock_product_hs_service))
+
+    # Act
+    response = client.post(
+        "/upload-zip/",
+        params={"stream": True},
+        files={"file_hs": ("hs.zip", b"zip", "application/zip")},
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "status": "success",
+        "processed": 3,
+        "files": {"hs_1.csv": 2, "hs_2.csv": 1},
+        "duplicate": False,
+        "synced": None,
+    }
+    mock_product_hs_service.load_zip_stream.assert_awaited_once()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_sync_zip(mock_product_hs_service: MagicMock) -> None:
+    # Arrange
+    result = HSSyncResult(processed=5, inserted=1, updated=2, removed=3)
+    mock_product_hs_service.sync_zip.return_value = result
+    client = TestClient(get_hs_test_app(mock_product_hs_service))
+
+    # Act
+    response = client.post(
+        "/sync-zip/",
+        files={"file_hs": ("hs.zip", b"zip", "application/zip")},
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == result.model_dump()
+
+
+def test_read_csv_blocks_all_members(tmp_path: Path) -> None:
+    # Arrange
+    rows = [f"qr{num},gtin{num},name {num}" for num in range(5)]
+    parts = {
+        "hs_2.csv": "\n".join(["filter", CSV_HEADER, rows[4]]),
+        "hs_1.csv": "\n".join(["filter", CSV_HEADER, *rows[:4]]),
+    }
+    archive = tmp_path / "hs.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("readme.txt", "")
+        for member, part in parts.items():
+            zf.writestr(member, part)
+
+    # Act
+    blocks = list(read_csv_blocks(str(archive), block_bytes=40))
+
+    # Assert
+    content: dict[str, bytes] = {}
+    for member, block in blocks:
+        content[member] = content.get(member, b"") + block
+    assert len(blocks) > len(content)
+    assert list(content) == ["hs_1.csv", "hs_2.csv"]
+    assert content == {member: part.encode() for member, part in parts.items()}
+
+
+def test_read_blocks_keeps_quoted_line_breaks() -> None:
+    # Arrange
+    rows = [f'qr{num},gtin{num},"name\n""{num}""\nend"' for num in range(5)]
+    content = "\n".join([CSV_HEADER, *rows]).encode()
+
+    # Act
+    blocks = list(read_blocks(io.BytesIO(content), block_bytes=20))
+
+    # Assert
+    assert b"".join(blocks) == content
+    header = CSV_HEADER.encode() + b"\n"
+    frames = [
+        pd.read_csv(io.BytesIO(block if num == 0 else header + block))
+        for num, block in enumerate(blocks)
+    ]
+    assert len(frames) > 1
+    assert list(pd.concat(frames)["Наименование товара"]) == [
+        f'name\n"{num}"\nend' for num in range(5)
+    ]
+
+
+def test_validator_reports_rows() -> None:
+    # Arrange
+    df = pd.DataFrame(
+        {
+            **{column: ["value", "value"] for column in HS_STRING_COLUMNS},
+            "code_mark_head": ["qr", ""],
+            "data_in": ["2025-04-02T10:00:00.000Z", "not a date"],
+        }
+    )
+
+    # Act
+    with pytest.raises(HTTPException) as error:
+        HSFrameValidator().validate(df)
+
+    # Assert
+    assert error.value.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert error.value.detail["errors"] == [
+        {
+            "column": "code_mark_head",
+            "reason": "empty",
+            "count": 1,
+            "rows": [2],
+        },
+        {"column": "data_in", "reason": "not_date", "count": 1, "rows": [2]},
+    ]
+
+
+def test_validator_coerces_dates() -> None:
+    # Arrange
+    df = pd.DataFrame(
+        {
+            **{column: ["value"] for column in HS_STRING_COLUMNS},
+            "data_in": ["2025-04-02T10:00:00.000Z"],
+            "extra": ["dropped"],
+        }
+    )
+
+    # Act
+    validated = HSFrameValidator().validate(df)
+
+    # Assert
+    assert list(validated.columns) == HS_COLUMNS
+    assert validated["data_in"].iloc[0].date() == date(2025, 4, 2)
+
+
+def test_validator_split_rejects_rows() -> None:
+    # Arrange
+    df = pd.DataFrame(
+        {
+            **{column: ["value"] * 4 for column in HS_STRING_COLUMNS},
+            "code_mark_head": ["qr1", "", "qr1", "qr2"],
+            "data_in": ["2025-04-02T10:00:00.000Z", "not a date"] * 2,
+        }
+    )
+
+    # Act
+    valid, rejected = HSFrameValidator().split(df)
+
+    # Assert
+    assert list(valid["code_mark_head"]) == ["qr1"]
+    assert {key: list(frame.index) for key, frame in rejected.items()} == {
+        ("code_mark_head", "empty"): [1],
+        ("data_in", "not_date"): [3],
+        ("code_mark_head", "duplicate"): [2],
+    }
+
+
+def test_validator_rejects_missing_strings_in_pyarrow_frame() -> None:
+    # Arrange
+    df = pd.DataFrame(
+        {
+            **{column: ["value"] * 3 for column in HS_STRING_COLUMNS},
+            "code_mark_head": ["qr1", None, "qr3"],
+            "brand": ["value", "value", None],
+            "data_in": ["2025-04-02T10:00:00.000Z"] * 3,
+        }
+    ).astype({column: "string[pyarrow]" for column in HS_STRING_COLUMNS})
+
+    # Act
+    valid, rejected = HSFrameValidator().split(df)
+
+    # Assert
+    assert list(valid["code_mark_head"]) == ["qr1"]
+    assert {key: list(frame.index) for key, frame in rejected.items()} == {
+        ("code_mark_head", "empty"): [1],
+        ("brand", "not_string"): [2],
+    }
+
+
+def test_split_rejects_malformed_lines() -> None:
+    # Arrange
+    service = ProductHSService(MagicMock(spec=AbstractProductHSRepository))
+    columns = list(service.COLUMN_MAPPING)
+    row = ",".join(["qr{}", "", *["value"] * 5, "2025-04-02T10:00:00Z"])
+    lines = [row.format(0), row.format(1) + ",extra", "qr2", row.format(3)]
+    block = "\n".join([",".join(columns), *lines]).encode()
+
+    # Act
+    df = service._prepare_frame(
+        parse_csv_block(block, service._block_params(), [])
+    )
+    valid, rejected = HSFrameValidator().split(df)
+    validated = HSFrameValidator().validate(df)
+
+    # Assert
+    assert list(valid["code_mark_head"]) == ["qr0", "qr3"]
+    assert list(valid.index) == [0, 3]
+    assert list(rejected[("", REASON_MALFORMED)].index) == [1, 2]
+    assert list(validated.index) == [0, 3]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_accept_frames_bisects_row_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    monkeypatch.setattr(rejects, "REJECTS_DIR", str(tmp_path))
+    df = pd.DataFrame(
+        {
+            **{column: ["value"] * 5 for column in HS_STRING_COLUMNS},
+            "code_mark_head": ["qr0", "bad", "qr2", "qr3", "qr4"],
+            "data_in": ["2025-04-02T10:00:00.000Z"] * 5,
+        }
+    )
+    repository = ProductHSRepository(AsyncMock())
+
+    async def copy_frame(frame: pd.DataFrame, table_name: str) -> int:
+        if "bad" in set(frame["code_mark_head"]):
+            raise asyncpg.DataError("invalid input")
+        return len(frame)
+
+    monkeypatch.setattr(repository, "_copy_frame", copy_frame)
+    monkeypatch.setattr(
+        repository, "_insert_accepted", AsyncMock(return_value=["qr4"])
+    )
+    report = RejectReport()
+
+    async def frames() -> AsyncIterator[pd.DataFrame]:
+        yield df
+
+    # Act
+    accepted = await repository.accept_frames(frames(), report)
+
+    # Assert
+    assert accepted == 3
+    assert report.counts == {
+        ("", "database"): 1,
+        ("code_mark_head", "duplicate"): 1,
+    }
+    assert get_report_path(report.id) == report.path
+    rows = pd.read_csv(report.path, keep_default_na=False)
+    assert list(rows["row"]) == [2, 5]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_copy_parallel_over_sessions(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    sessions = [AsyncMock() for _ in range(3)]
+    factory = MagicMock(side_effect=sessions)
+    monkeypatch.setattr(products_hs, "async_session", factory)
+    monkeypatch.setattr(settings, "HS_LOAD_CONNECTIONS", 3)
+    copied: list[int] = []
+
+    async def copy_data(
+        repository: ProductHSRepository, df: pd.DataFrame, table_name: str
+    ) -> int:
+        await asyncio.sleep(0)
+        copied.append(len(df))
+        return len(df)
+
+    monkeypatch.setattr(ProductHSRepository, "_copy_data", copy_data)
+
+    async def frames() -> AsyncIterator[pd.DataFrame]:
+        for rows in (4, 4, 2):
+            yield pd.DataFrame({"code_mark_head": ["qr"] * rows})
+
+    # Act
+    processed = await ProductHSRepository(AsyncMock())._copy_parallel(
+        frames(), "producthss_load"
+    )
+
+    # Assert
+    assert processed == 10
+    assert sorted(copied) == [2, 4, 4]
+    for session in sessions:
+        session.__aenter__.return_value.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_copy_parallel_error_cancels_writers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    monkeypatch.setattr(
+        products_hs, "async_session", MagicMock(return_value=AsyncMock())
+    )
+    monkeypatch.setattr(settings, "HS_LOAD_CONNECTIONS", 2)
+
+    async def copy_data(
+        repository: ProductHSRepository, df: pd.DataFrame, table_name: str
+    ) -> int:
+        if df.empty:
+            raise HTTPException(HTTPStatus.UNPROCESSABLE_ENTITY, "bad rows")
+        await asyncio.sleep(10)
+        return len(df)
+
+    monkeypatch.setattr(ProductHSRepository, "_copy_data", copy_data)
+
+    async def frames() -> AsyncIterator[pd.DataFrame]:
+        yield pd.DataFrame({"code_mark_head": ["qr"]})
+        yield pd.DataFrame()
+
+    # Act
+    with pytest.raises(HTTPException) as error:
+        await asyncio.wait_for(
+            ProductHSRepository(AsyncMock())._copy_parallel(
+                frames(), "producthss_load"
+            ),
+            timeout=5,
+        )
+
+    # Assert
+    assert error.value.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+@pytest.mark.parametrize(  # type: ignore[misc]
+    "table_name, locked",
+    [("producthss_staging", True), ("producthss_load_1", False)],
+)
+async def test_discard_table_locks_only_staging(
+    table_name: str, locked: bool
+) -> None:
+    # Arrange
+    session = AsyncMock()
+    repository = ProductHSRepository(session)
+
+    # Act
+    await repository._discard_table(table_name)
+
+    # Assert
+    statements = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert any("pg_advisory_xact_lock" in sql for sql in statements) is locked
+    assert statements[-1] == f"DROP TABLE IF EXISTS {table_name}"
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_reload_drops_leftover_staging_table(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    session = AsyncMock()
+    repository = ProductHSRepository(session)
+    monkeypatch.setattr(repository, "_swap_and_commit", AsyncMock())
+
+    async def frames() -> AsyncIterator[pd.DataFrame]:
+        return
+        yield
+
+    # Act
+    await repository._reload_and_commit(frames())
+
+    # Assert
+    statements = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert statements[1:] == [
+        "DROP TABLE IF EXISTS producthss_staging",
+        products_hs.create_copy_table("producthss_staging"),
+    ]
+    assert "pg_advisory_xact_lock" in statements[0]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_swap_sets_logged_before_indexes_and_analyzes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    session = AsyncMock()
+    repository = ProductHSRepository(session)
+    statements: list[str] = []
+    session.execute.side_effect = lambda stmt, *_: statements.append(str(stmt))
+
+    async def build_staging_indexes() -> dict[str, str]:
+        statements.append("indexes")
+        return {}
+
+    monkeypatch.setattr(
+        repository, "_build_staging_indexes", build_staging_indexes
+    )
+
+    # Act
+    await repository._swap_and_commit()
+
+    # Assert
+    assert statements == [
+        "ALTER TABLE producthss_staging SET LOGGED",
+        "indexes",
+        "DROP TABLE producthss",
+        "ALTER TABLE producthss_staging RENAME TO producthss",
+        "ANALYZE producthss",
+    ]
+    session.commit.assert_awaited_once()
+
+
+def get_sync_repository(
+    rows: int, monkeypatch: pytest.MonkeyPatch
+) -> tuple[ProductHSRepository, AsyncMock]:
+    session = AsyncMock()
+    # 8 of 10 codes of the table are missing in the snapshot.
+    session.execute.return_value.one = MagicMock(return_value=(10, 8))
+    repository = ProductHSRepository(session)
+    monkeypatch.setattr(settings, "HS_SYNC_MAX_REMOVED_SHARE", 0.5)
+    monkeypatch.setattr(repository, "_copy_data", AsyncMock(return_value=rows))
+    monkeypatch.setattr(
+        repository, "_upsert_incoming", AsyncMock(return_value=(0, 2))
+    )
+    monkeypatch.setattr(
+        repository, "_remove_missing", AsyncMock(return_value=8)
+    )
+    return repository, session
+
+
+async def get_frames() -> AsyncIterator[pd.DataFrame]:
+    yield pd.DataFrame()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+@pytest.mark.parametrize(  # type: ignore[misc]
+    "rows, status_code",
+    [(0, HTTPStatus.BAD_REQUEST), (2, HTTPStatus.CONFLICT)],
+)
+async def test_sync_refuses_empty_and_mass_removal(
+    rows: int, status_code: HTTPStatus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    repository, session = get_sync_repository(rows, monkeypatch)
+
+    # Act
+    with pytest.raises(HTTPException) as error:
+        await repository.sync_frames(get_frames())
+
+    # Assert
+    assert error.value.status_code == status_code
+    session.rollback.assert_awaited_once()
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_sync_mass_removal_with_force(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    repository, session = get_sync_repository(2, monkeypatch)
+
+    # Act
+    result = await repository.sync_frames(get_frames(), force=True)
+
+    # Assert
+    assert (result.processed, result.removed) == (2, 8)
+    session.commit.assert_awaited_once()
+
+
+def test_rejects_report_not_found(mock_product_hs_service: MagicMock) -> None:
+    # Arrange
+    client = TestClient(get_hs_test_app(mock_product_hs_service))
+
+    # Act
+    response = client.get("/rejects/unknown/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_check_page_cursor() -> None:
+    # Arrange
+    rows = [
+        (None, ProductHS(f"qr{num}", "gtin", f"name {num}", "", date.today()))
+        for num in range(3)
+    ]
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.get_incorrect_page = AsyncMock(return_value=rows)
+    repository.count_incorrect = AsyncMock(return_value=7)
+    service = ProductHSService(repository)
+
+    # Act
+    page = await service.check_page("base_hs", 2, "qr", with_total=True)
+
+    # Assert
+    assert [item.code_mark_head_hs for item in page.items] == ["qr0", "qr1"]
+    assert page.next_cursor == "qr1"
+    assert page.total == 7
+    repository.get_incorrect_page.assert_awaited_once_with("base_hs", 3, "qr")
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_export_check_csv() -> None:
+    # Arrange
+    async def stream_incorrect(key: str) -> AsyncIterator[list[Any]]:
+        yield [(None, ProductHS("qr;1", "gtin", "name", "", date.today()))]
+
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.stream_incorrect = stream_incorrect
+    service = ProductHSService(repository)
+
+    # Act
+    content = b"".join(
+        [chunk async for chunk in service.export_check_csv("base_hs")]
+    )
+
+    # Assert
+    assert content.decode("utf-8-sig").splitlines() == [
+        "code_mark_head;name;code_mark_head_hs;name_hs",
+        ';;"qr;1";name',
+    ]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_check_all_groups_rows() -> None:
+    # Arrange
+    product_hs = ProductHS("qr1", "gtin", "name", "", date.today())
+    rows = [(None, product_hs, "base_hs"), (None, product_hs, "base_hs")]
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.get_incorrect_all = AsyncMock(return_value=rows)
+    service = ProductHSService(repository)
+
+    # Act
+    result = await service.check_all()
+
+    # Assert
+    assert result.counts == {"hs_base": 0, "base_hs": 2, "hs_hs": 0}
+    assert [item.code_mark_head_hs for item in result.items["base_hs"]] == [
+        "qr1",
+        "qr1",
+    ]
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_clear_refreshes_summary() -> None:
+    # Arrange
+    counts = {"hs_base": 4, "base_hs": 0, "hs_hs": 1}
+    statuses = {"NOT_DEFINED": 0, "ON_BALANCE": 5}
+    summary_repository = MagicMock(spec=AbstractSummaryRepository)
+    summary_repository.compute = AsyncMock(return_value=(counts, statuses))
+    summary_repository.add = AsyncMock(side_effect=lambda summary: summary)
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.clear = AsyncMock()
+    service = ProductHSService(repository, SummaryService(summary_repository))
+
+    # Act
+    await service.clear()
+
+    # Assert
+    (summary,) = summary_repository.add.call_args.args
+    assert summary.source == SOURCE_HS_CLEAR
+    assert summary.counts == counts
+    assert summary.statuses == statuses
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_summary_refresh_error_is_logged() -> None:
+    # Arrange
+    summary_repository = MagicMock(spec=AbstractSummaryRepository)
+    summary_repository.compute = AsyncMock(
+        side_effect=HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR)
+    )
+    service = SummaryService(summary_repository)
+
+    # Act
+    summary = await service.refresh(SOURCE_HS_CLEAR)
+
+    # Assert
+    assert summary is None
+    summary_repository.add.assert_not_called()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_summary_refresher_coalesces_writes() -> None:
+    # Arrange
+    refreshed: list[str] = []
+
+    async def refresh(source: str) -> None:
+        refreshed.append(source)
+        if len(refreshed) == 1:
+            refresher.schedule(SOURCE_PRODUCTS)  # Write during the refresh
+            refresher.schedule(SOURCE_PRODUCTS)
+
+    refresher = SummaryRefresher(refresh, delay=0)
+    repository = MagicMock(spec=AbstractProductRepository)
+    service = ProductService(repository, refresher)
+
+    # Act
+    await service.del_products()
+    await service.del_products()
+    first = refresher.task
+    assert first is not None
+    await first
+    await refresher.shutdown()
+
+    # Assert
+    assert refreshed == [SOURCE_PRODUCTS, SOURCE_PRODUCTS]
+    assert refresher.task is first
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_check_cached_until_data_version_changes() -> None:
+    # Arrange
+    rows = [(None, ProductHS("qr1", "gtin", "name", "", date.today()))]
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.get_incorrect = AsyncMock(return_value=rows)
+    repository.clear = AsyncMock()
+    service = ProductHSService(repository, cache=TTLCache(4, 60))
+
+    # Act
+    await service.check("base_hs")
+    cached = await service.check("base_hs")
+    await service.clear()
+    await service.check("base_hs")
+
+    # Assert
+    assert cached == [ProductCheck(name_hs="name", code_mark_head_hs="qr1")]
+    assert repository.get_incorrect.await_count == 2
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_apply_check_route(mock_product_hs_service: MagicMock) -> None:
+    # Arrange
+    result = CheckApplyResult(
+        key="hs_hs",
+        status=StatusEnum.IN_HS_DEDUCTED,
+        affected=12,
+        dry_run=True,
+    )
+    mock_product_hs_service.apply_check.return_value = result
+    client = TestClient(get_hs_test_app(mock_product_hs_service))
+
+    # Act
+    response = client.post(
+        "/check/apply/", json={"key": "hs_hs", "dry_run": True}
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["affected"] == 12
+    mock_product_hs_service.apply_check.assert_awaited_once_with(
+        "hs_hs", None, True
+    )
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_apply_check_default_status() -> None:
+    # Arrange
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.apply_check = AsyncMock(return_value=5)
+    service = ProductHSService(repository)
+
+    # Act
+    result = await service.apply_check("hs_hs", None, dry_run=True)
+    with pytest.raises(HTTPException) as error:
+        await service.apply_check("hs_base", None, dry_run=True)
+
+    # Assert
+    assert result.status == StatusEnum.IN_HS_DEDUCTED
+    assert result.affected == 5
+    assert error.value.status_code == HTTPStatus.BAD_REQUEST
+    repository.apply_check.assert_awaited_once_with(
+        "hs_hs", StatusEnum.IN_HS_DEDUCTED, True
+    )
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_parsed_frames_in_process_pool(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    columns = list(ProductHSService.COLUMN_MAPPING)
+    rows = [
+        ",".join([f"qr{num}", *["value"] * 6, "2025-04-02T10:00:00.000Z"])
+        for num in range(50)
+    ]
+    archive = tmp_path / "hs.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for part, part_rows in enumerate((rows[:30], rows[30:]), 1):
+            zf.writestr(
+                f"hs_{part}.csv",
+                "\n".join(["filter", ",".join(columns), *part_rows]),
+            )
+    monkeypatch.setattr(settings, "HS_PARSE_BLOCK_BYTES", 512)
+    service = ProductHSService(MagicMock(spec=AbstractProductHSRepository))
+    files: dict[str, int] = {}
+
+    # Act
+    try:
+        frames = [
+            frame
+            async for frame in service._iter_parsed_frames(str(archive), files)
+        ]
+    finally:
+        shutdown_process_pool()
+
+    # Assert
+    assert len(frames) > 2
+    codes = [code for frame in frames for code in frame["code_mark_head"]]
+    assert codes == [f"qr{num}" for num in range(50)]
+    assert list(pd.concat(frames).index) == list(range(50))
+    assert files == {"hs_1.csv": 30, "hs_2.csv": 20}
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_job_registry_stages() -> None:
+    # Arrange
+    registry = JobRegistry(keep=1)
+    failed = registry.create("load")
+    done = registry.create("sync")
+
+    async def fail() -> None:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "bad file")
+
+    # Act
+    registry.start(failed, fail)
+    registry.start(done, AsyncMock())
+    await asyncio.gather(*registry.tasks)
+
+    # Assert
+    assert (failed.stage, failed.errors) == (JOB_FAILED, ["bad file"])
+    assert done.stage == JOB_DONE
+    assert registry.get(failed.id) is None
+    assert registry.get(done.id) is done
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_job_reports_load_stages() -> None:
+    # Arrange
+    columns = list(ProductHSService.COLUMN_MAPPING)
+    row = ",".join(["qr", "", *["value"] * 5, "2025-04-02T10:00:00Z"])
+    archive = get_archive({"hs.csv": "\n".join(["f", ",".join(columns), row])})
+    registry = JobRegistry()
+    job = registry.create(JOB_LOAD)
+    stages: list[str] = []
+
+    async def load_frames(frames: AsyncIterator[pd.DataFrame]) -> int:
+        stages.append(job.stage)
+        rows = sum([len(frame) async for frame in frames])
+        stages.append(job.stage)
+        return rows
+
+    async def compute() -> tuple[dict[str, int], dict[str, int]]:
+        stages.append(job.stage)
+        return {}, {}
+
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.load_frames.side_effect = load_frames
+    summary_repository = MagicMock(spec=AbstractSummaryRepository)
+    summary_repository.compute.side_effect = compute
+    service = ProductHSService(repository, SummaryService(summary_repository))
+
+    # Act
+    try:
+        registry.start(
+            job,
+            lambda: service._load_archive(archive, "sha", JOB_LOAD, {}, job),
+        )
+        await asyncio.gather(*registry.tasks)
+    finally:
+        shutdown_process_pool()
+
+    # Assert
+    assert stages == [JOB_PARSING, JOB_LOADING, JOB_SUMMARIZING]
+    assert job.stage == JOB_DONE
+
+
+def test_job_status_not_found(mock_product_hs_service: MagicMock) -> None:
+    # Arrange
+    client = TestClient(get_hs_test_app(mock_product_hs_service))
+
+    # Act
+    response = client.get("/jobs/unknown/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_parse_blocks_pyarrow_in_process_pool(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    columns = list(ProductHSService.COLUMN_MAPPING)
+    rows = [
+        ",".join([f"qr{num}", "", *["value"] * 5, "2025-04-02T10:00:00Z"])
+        for num in range(30)
+    ]
+    archive = get_archive(
+        {"hs.csv": "\n".join(["filter", ",".join(columns), *rows])}
+    )
+    monkeypatch.setattr(settings, "HS_PARSE_BLOCK_BYTES", 256)
+    service = ProductHSService(MagicMock(spec=AbstractProductHSRepository))
+    files: dict[str, int] = {}
+
+    # Act
+    try:
+        frames = [
+            frame
+            async for frame in service._iter_parsed_frames(archive, files)
+        ]
+    finally:
+        shutdown_process_pool()
+
+    # Assert
+    df = pd.concat(frames)
+    assert len(frames) > 1
+    assert files == {"hs.csv": 30}
+    assert list(df.index) == list(range(30))
+    assert str(df["code_mark_head"].dtype) == "string"
+    assert df["code_hs"].iloc[0] == ""
+    assert df["data_in"].iloc[-1].date() == date(2025, 4, 2)
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_process_pool_replaced_after_worker_died() -> None:
+    # Arrange
+    loop = asyncio.get_running_loop()
+    broken = get_process_pool()
+    with pytest.raises(BrokenProcessPool):
+        await loop.run_in_executor(broken, os._exit, 1)
+
+    # Act
+    try:
+        pool = get_process_pool()
+        result = await loop.run_in_executor(pool, abs, -1)
+    finally:
+        shutdown_process_pool()
+
+    # Assert
+    assert pool is not broken
+    assert result == 1
+
+
+def get_archive(members: dict[str, str]) -> bytes:
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as zf:
+        for member, csv_content in members.items():
+            zf.writestr(member, csv_content)
+    return content.getvalue()
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_spool_file_sha256() -> None:
+    # Arrange
+    content = get_archive({"hs.csv": "filter"})
+    file_hs = UploadFile(io.BytesIO(content), filename="hs.zip")
+
+    # Act
+    path, sha256 = await FileHandler().spool_file(file_hs)
+
+    # Assert
+    try:
+        assert sha256 == hashlib.sha256(content).hexdigest()
+        assert Path(path).read_bytes() == content
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_spool_file_removed_on_cancellation(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    # Arrange
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    file_hs = MagicMock(spec=UploadFile)
+    file_hs.read.side_effect = [b"zip", asyncio.CancelledError()]
+
+    # Act
+    with pytest.raises(asyncio.CancelledError):
+        await FileHandler().spool_file(file_hs)
+
+    # Assert
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_identical_upload_returns_stored_result() -> None:
+    # Arrange
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    snapshots = MagicMock(spec=AbstractSnapshotRepository)
+    snapshots.get_latest.return_value = HSSnapshot(
+        "sha",
+        JOB_LOAD,
+        {"hs.csv": 1},
+        {"processed": 3, "files": {"hs.csv": 3}},
+    )
+    service = ProductHSService(
+        repository, snapshots=SnapshotService(snapshots)
+    )
+
+    # Act
+    result = await service._load_archive(
+        get_archive({"hs.csv": "filter"}), "sha", JOB_LOAD, {}
+    )
+
+    # Assert
+    assert result == {
+        "processed": 3,
+        "files": {"hs.csv": 3},
+        "duplicate": True,
+    }
+    repository.load_frames.assert_not_awaited()
+    snapshots.add.assert_not_awaited()
+
+
+def get_near_service(
+    members: dict[str, int],
+) -> tuple[ProductHSService, MagicMock, MagicMock]:
+    repository = MagicMock(spec=AbstractProductHSRepository)
+    repository.load_frames.return_value = 4
+    repository.sync_frames.return_value = HSSyncResult(
+        processed=5, inserted=1, updated=2, removed=0
+    )
+    snapshots = MagicMock(spec=AbstractSnapshotRepository)
+    snapshots.get_latest.return_value = HSSnapshot(
+        "old", JOB_LOAD, members, {"processed": 4}
+    )
+    service = ProductHSService(
+        repository, snapshots=SnapshotService(snapshots, near_share=0.5)
+    )
+    return service, repository, snapshots
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+async def test_near_upload_is_synced_with_diff() -> None:
+    # Arrange
+    service, repository, snapshots = get_near_service(
+        {"hs_1.csv": zlib.crc32(b"filter"), "hs_2.csv": 2}
+    )
+    archive = get_archive({"hs_1.csv": "filter", "hs_2.csv": "filter"})
+
+    # Act
+    result = await service._load_archive(
+        archive, "new", JOB_LOAD, {}, diff=True
+    )
+
+    # Assert
+    assert result["processed"] == 5
+    assert result["synced"]["updated"] == 2
+    repository.load_frames.assert_not_awaited()
+    snapshots.lock.assert_called_once_with("new")
+    snapshot = snapshots.add.call_args[0][0]
+    assert (snapshot.sha256, snapshot.mode) == ("new", JOB_LOAD)
+
+
+@pytest.mark.asyncio  # type: ignore[misc]
+@pytest.mark.parametrize(  # type: ignore[misc]
+    "crc, diff",
+    [
+        (zlib.crc32(b"filter"), False),  # Near upload without opt-in
+        (1, True),  # Same file names, other content
+    ],
+)
+async def test_upload_is_loaded_unless_near_with_diff(
+    crc: int, diff: bool
+) -> None:
+    # Arrange
+    service, repository, _ = get_near_service({"hs_1.csv": crc, "hs_2.csv": 2})
+    archive = get_archive({"hs_1.csv": "filter", "hs_2.csv": "other"})
+
+    # Act
+    result = await service._load_archive(
+        archive, "new", JOB_LOAD, {}, diff=diff
+    )
+
+    # Assert
+    assert result["processed"] == 4
+    assert result["synced"] is None
+    repository.sync_frames.assert_not_awaited()